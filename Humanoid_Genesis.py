@@ -1,38 +1,262 @@
 # humanoid_genesis.py
 from __future__ import annotations
-import os, json, time, uuid, math
-from typing import Dict, Any, List, Optional, Callable
+import os, re, json, time, uuid, math, asyncio, hashlib, threading, atexit, argparse, functools
+import contextlib, contextvars
+import importlib.util
+from typing import Dict, Any, List, Optional, Callable, Tuple
+from itertools import islice
 from dataclasses import dataclass, field
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
+def _has_module(name: str) -> bool:
+    """True if `name` is importable, without paying for the import itself."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
 # ===== Optional ROS2 hooks =====
-ROS_AVAILABLE = False
+# rclpy ถูก import ตอนสร้าง runtime ที่เปิด ROS จริงเท่านั้น
+ROS_AVAILABLE = _has_module("rclpy")
+
+# ===== Optional fast JSON codec =====
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+def _dump_json(obj: Any, indent: bool=True) -> bytes:
+    if orjson is not None:
+        opt = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=opt)
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _load_json(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def _json_str(obj: Any) -> str:
+    """Compact single-line JSON text (for prompts)."""
+    return _dump_json(obj, indent=False).decode("utf-8")
+
+# ===== Optional multi-keyword scanner (pyahocorasick) =====
 try:
-    import rclpy
-    from rclpy.node import Node
-    ROS_AVAILABLE = True
+    import ahocorasick
 except Exception:
-    ROS_AVAILABLE = False
+    ahocorasick = None
 
 # ===== Optional LLM providers =====
+# SDKs are imported on first use (google.generativeai alone is ~400 ms cold),
+# so start-up only checks that they are installed and a key is set.
 load_dotenv()
-_USE_OPENAI = False
-_USE_GEMINI = False
-try:
+_USE_OPENAI = bool(os.getenv("OPENAI_API_KEY")) and _has_module("openai")
+_USE_GEMINI = bool(os.getenv("GEMINI_API_KEY")) and _has_module("google.generativeai")
+
+@functools.cache
+def _openai_client():
     from openai import OpenAI
-    _OPENAI = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    _USE_OPENAI = True if os.getenv("OPENAI_API_KEY") else False
-except Exception:
-    pass
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-try:
+# AsyncOpenAI pools connections on the loop that first used them, and
+# run_once() makes a fresh loop per goal → no process-wide async client.
+# LLM.session() opens one per think() and closes it on the same loop.
+_ASYNC_OPENAI: contextvars.ContextVar[Optional[Any]] = contextvars.ContextVar("_ASYNC_OPENAI", default=None)
+
+def _new_async_openai_client():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+@functools.cache
+def _genai():
     import google.generativeai as genai
-    if os.getenv("GEMINI_API_KEY"):
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        _USE_GEMINI = True
-except Exception:
-    pass
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai
+
+# -----------------------------
+# Debounced JSON file (shared by cache + memory)
+# -----------------------------
+class _DebouncedJSONFile:
+    """
+    save() แค่ mark dirty แล้ว debounce การเขียนดิสก์
+    (เขียนจริงหลังเงียบไป flush_delay วินาที, atomic ผ่าน .tmp + os.replace)
+    subclass ให้ _payload() คืน object ที่จะเขียน
+    """
+    _indent = True
+
+    def __init__(self, path: str, flush_delay: float):
+        self.path = path
+        self.flush_delay = flush_delay
+        self._dirty = False
+        self._lock = threading.RLock()
+        self._flush_timer: Optional[threading.Timer] = None
+        atexit.register(self.flush)
+
+    def _read(self) -> Optional[Any]:
+        if os.path.exists(self.path):
+            try:
+                with open(self.path,"rb") as f:
+                    return _load_json(f.read())
+            except Exception:
+                pass
+        return None
+
+    def _payload(self) -> Any:
+        raise NotImplementedError
+
+    def save(self):
+        with self._lock:
+            self._dirty = True
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+            self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self):
+        """Write pending state to disk now (called by the debounce timer and at exit)."""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._dirty:
+                return
+            tmp = self.path + ".tmp"
+            with open(tmp,"wb") as f:
+                f.write(_dump_json(self._payload(), indent=self._indent))
+            os.replace(tmp, self.path)
+            self._dirty = False
+
+# -----------------------------
+# Semantic Cache (skip repeated round-trips)
+# -----------------------------
+_TASK_MARK = "\n\nTASK:\n"  # task_message(): MEMORY/world ก่อน แล้วค่อย TASK
+
+class SemanticCache(_DebouncedJSONFile):
+    """
+    แคชคำตอบ LLM: exact-hash (model + system + user + temperature) ก่อนเสมอ
+    semantic=True (opt-in): cosine similarity บน embedding ของส่วน TASK เท่านั้น
+    และเทียบเฉพาะ entry ที่ model/system/temperature/MEMORY(+world) ตรงกันทุก byte
+    → goal คล้ายกันแต่ world ต่างกัน (เช่น คนเข้ามาใกล้) จะไม่ได้แผนเก่ากลับมา
+    message ที่ไม่มี TASK (aligner, compound) ใช้ได้แค่ exact
+    model = "provider:model" (LLM.model_id) → เปลี่ยน provider/model ไม่ได้คำตอบของตัวเก่า
+    Embedding ใช้ sentence-transformers ถ้าติดตั้งไว้ ไม่งั้นเหลือแค่ exact-hash
+    แต่ละชั้นเก็บไม่เกิน max_entries: exact = LRU (ไม่ได้ใช้นานสุดออกก่อน), semantic = เก่าสุดออกก่อน
+    """
+    _indent = False  # embedding lists: keep the file compact
+    _MAX_PENDING = 64  # get() misses whose set() never came (provider error)
+
+    def __init__(self, path="humanoid_genesis_cache.json",
+                 semantic: bool=False,
+                 threshold: float=0.92,
+                 embed_model: str="sentence-transformers/all-MiniLM-L6-v2",
+                 flush_delay: float=0.5,
+                 max_entries: int=2000):
+        super().__init__(path, flush_delay)
+        self.semantic = semantic
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.embed_model = embed_model
+        self.exact: Dict[str, str] = {}
+        self.entries: List[Dict[str, Any]] = []  # {"bucket": ..., "emb": [...], "text": "..."}
+        self._encoder = None      # lazy; False = unavailable
+        self._matrices: Dict[str, Any] = {}  # bucket -> (normalized embeddings, entry idx); dropped on set()
+        self._pending: Dict[str, Any] = {}  # key -> embedding computed in get()
+        data = self._read() or {}
+        # dict order = LRU order (oldest first); keep the newest max_entries
+        self.exact = dict(list(data.get("exact", {}).items())[-max_entries:])
+        # entries without a bucket predate context bucketing and could match any world: drop them
+        self.entries = [e for e in data.get("semantic", []) if "bucket" in e][-max_entries:]
+
+    def _payload(self) -> Any:
+        return {"exact": self.exact, "semantic": self.entries}
+
+    @staticmethod
+    def _hash(*parts: str) -> str:
+        return hashlib.blake2b("\n".join(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+    @staticmethod
+    def key(model: str, system: str, user: str, temperature: float) -> str:
+        return SemanticCache._hash(model, repr(float(temperature)), system, user)
+
+    @staticmethod
+    def _split(model: str, system: str, user: str, temperature: float):
+        """(bucket, task): bucket = hash ของทุกอย่างยกเว้น TASK; task = None ถ้าไม่มี TASK"""
+        context, sep, task = user.rpartition(_TASK_MARK)
+        if not sep or not task.strip():
+            return None, None
+        return SemanticCache._hash(model, repr(float(temperature)), system, context), task
+
+    def _embed(self, text: str):
+        if self._encoder is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+                self._encoder = SentenceTransformer(self.embed_model)
+            except Exception:
+                self._encoder = False
+        if self._encoder is False:
+            return None
+        return self._encoder.encode(text, normalize_embeddings=True)
+
+    def _bucket_matrix(self, bucket: str):
+        if bucket not in self._matrices:
+            import numpy as np
+            idx = [i for i, e in enumerate(self.entries) if e["bucket"] == bucket]
+            mat = np.asarray([self.entries[i]["emb"] for i in idx], dtype=np.float32)
+            self._matrices[bucket] = (mat, idx)
+        return self._matrices[bucket]
+
+    def get(self, model: str, system: str, user: str, temperature: float) -> Optional[str]:
+        k = self.key(model, system, user, temperature)
+        with self._lock:
+            hit = self.exact.pop(k, None)
+            if hit is not None:
+                self.exact[k] = hit  # move to the MRU end
+        if hit is not None or not self.semantic:
+            return hit
+        bucket, task = self._split(model, system, user, temperature)
+        if bucket is None:
+            return None
+        emb = self._embed(task)
+        if emb is None:
+            return None
+        with self._lock:
+            self._pending[k] = emb
+            while len(self._pending) > self._MAX_PENDING:
+                del self._pending[next(iter(self._pending))]
+            mat, idx = self._bucket_matrix(bucket)
+        if not idx:
+            return None
+        import numpy as np
+        sims = mat @ emb
+        i = int(np.argmax(sims))
+        return self.entries[idx[i]]["text"] if sims[i] >= self.threshold else None
+
+    def set(self, model: str, system: str, user: str, temperature: float, text: str):
+        k = self.key(model, system, user, temperature)
+        emb = None
+        bucket = None
+        if self.semantic:
+            bucket, task = self._split(model, system, user, temperature)
+            with self._lock:
+                emb = self._pending.pop(k, None)
+            if bucket is not None and emb is None:
+                emb = self._embed(task)
+        with self._lock:
+            self.exact.pop(k, None)
+            self.exact[k] = text
+            while len(self.exact) > self.max_entries:
+                del self.exact[next(iter(self.exact))]
+            if bucket is not None and emb is not None:
+                self.entries.append({"bucket": bucket, "emb": [float(x) for x in emb], "text": text})
+                if len(self.entries) > self.max_entries:
+                    # trimming shifts every index → rebuild all bucket matrices lazily
+                    del self.entries[:len(self.entries) - self.max_entries]
+                    self._matrices.clear()
+                else:
+                    self._matrices.pop(bucket, None)
+        self.save()
 
 # -----------------------------
 # LLM Interface (pluggable)
@@ -40,15 +264,109 @@ except Exception:
 class LLM:
     def __init__(self,
                  model_openai: str="gpt-4o-mini",
-                 model_gemini: str="gemini-1.5-pro"):
+                 model_gemini: str="gemini-1.5-pro",
+                 cache: Optional[SemanticCache]=None):
         self.model_openai = model_openai
         self.model_gemini = model_gemini
+        self.cache = cache
         if not (_USE_OPENAI or _USE_GEMINI):
             raise RuntimeError("No LLM provider configured.")
 
-    def chat(self, system: str, user: str, temperature: float=0.5) -> str:
+    @property
+    def model_id(self) -> str:
+        """provider:model ที่ตอบจริง (ใช้แยก cache ระหว่าง provider/model)"""
+        if _USE_OPENAI:
+            return f"openai:{self.model_openai}"
+        if _USE_GEMINI:
+            return f"gemini:{self.model_gemini}"
+        return "none"
+
+    def chat(self, system: str, user: str, temperature: float=0.5,
+             on_token: Optional[Callable[[str], None]]=None) -> str:
+        """on_token (optional) receives text deltas as the provider streams them."""
+        if self.cache is not None:
+            hit = self.cache.get(self.model_id, system, user, temperature)
+            if hit is not None:
+                if on_token:
+                    on_token(hit)
+                return hit
+        text = self._complete(system, user, temperature, on_token)
+        if self.cache is not None:
+            self.cache.set(self.model_id, system, user, temperature, text)
+        return text
+
+    @contextlib.asynccontextmanager
+    async def session(self):
+        """Async client for the achat() calls inside (current loop only); closed on exit."""
+        if not _USE_OPENAI or _ASYNC_OPENAI.get() is not None:
+            yield self
+            return
+        client = _new_async_openai_client()
+        token = _ASYNC_OPENAI.set(client)  # tasks gathered inside copy this context
+        try:
+            yield self
+        finally:
+            _ASYNC_OPENAI.reset(token)
+            await client.close()
+
+    async def achat(self, system: str, user: str, temperature: float=0.5) -> str:
+        """Async twin of chat(): lets independent calls overlap on the provider side."""
+        if self.cache is not None:
+            hit = self.cache.get(self.model_id, system, user, temperature)
+            if hit is not None:
+                return hit
+        text = await self._acomplete(system, user, temperature)
+        if self.cache is not None:
+            self.cache.set(self.model_id, system, user, temperature, text)
+        return text
+
+    def _complete(self, system: str, user: str, temperature: float,
+                  on_token: Optional[Callable[[str], None]]=None) -> str:
+        if _USE_OPENAI:
+            if on_token is None:
+                resp = _openai_client().chat.completions.create(
+                    model=self.model_openai,
+                    temperature=temperature,
+                    messages=[{"role":"system","content":system},
+                              {"role":"user","content":user}]
+                )
+                return resp.choices[0].message.content.strip()
+            parts = []
+            for chunk in _openai_client().chat.completions.create(
+                    model=self.model_openai,
+                    temperature=temperature,
+                    messages=[{"role":"system","content":system},
+                              {"role":"user","content":user}],
+                    stream=True):
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    on_token(delta)
+            return "".join(parts).strip()
+        elif _USE_GEMINI:
+            model = _genai().GenerativeModel(
+                model_name=self.model_gemini,
+                system_instruction=system
+            )
+            if on_token is None:
+                resp = model.generate_content(user)
+                return (resp.text or "").strip()
+            parts = []
+            for chunk in model.generate_content(user, stream=True):
+                if chunk.text:
+                    parts.append(chunk.text)
+                    on_token(chunk.text)
+            return "".join(parts).strip()
+        else:
+            return "LLM not available."
+
+    async def _acomplete(self, system: str, user: str, temperature: float) -> str:
         if _USE_OPENAI:
-            resp = _OPENAI.chat.completions.create(
+            client = _ASYNC_OPENAI.get()
+            if client is None:  # called outside session(): one-off client
+                async with self.session():
+                    return await self._acomplete(system, user, temperature)
+            resp = await client.chat.completions.create(
                 model=self.model_openai,
                 temperature=temperature,
                 messages=[{"role":"system","content":system},
@@ -56,11 +374,12 @@ class LLM:
             )
             return resp.choices[0].message.content.strip()
         elif _USE_GEMINI:
-            model = genai.GenerativeModel(
+            model = _genai().GenerativeModel(
                 model_name=self.model_gemini,
                 system_instruction=system
             )
-            resp = model.generate_content(user)
+            # sync call on a worker thread: genai's async client is tied to one loop too
+            resp = await asyncio.to_thread(model.generate_content, user)
             return (resp.text or "").strip()
         else:
             return "LLM not available."
@@ -68,35 +387,29 @@ class LLM:
 # -----------------------------
 # Echo Memory (Genesis Echo Layer)
 # -----------------------------
-class EchoMemory:
-    def __init__(self, path="humanoid_genesis_memory.json"):
-        self.path = path
-        self.state: Dict[str, Any] = {}
-        self._load()
+class EchoMemory(_DebouncedJSONFile):
+    """State อยู่ในหน่วยความจำ; เขียนดิสก์แบบ debounce + atomic (ดู _DebouncedJSONFile)"""
+    def __init__(self, path="humanoid_genesis_memory.json", flush_delay: float=0.25):
+        super().__init__(path, flush_delay)
+        self.state: Dict[str, Any] = self._read() or {}
 
-    def _load(self):
-        if os.path.exists(self.path):
-            try:
-                self.state = json.load(open(self.path,"r",encoding="utf-8"))
-            except Exception:
-                self.state = {}
-
-    def save(self):
-        json.dump(self.state, open(self.path,"w",encoding="utf-8"),
-                  ensure_ascii=False, indent=2)
+    def _payload(self) -> Any:
+        return self.state
 
     def profile(self) -> Dict[str, Any]:
         return self.state.get("profile", {})
 
     def update_profile(self, signals: Dict[str, Any]):
-        prof = self.profile()
-        prof.update(signals)
-        self.state["profile"] = prof
-        self.save()
+        with self._lock:
+            prof = self.profile()
+            prof.update(signals)
+            self.state["profile"] = prof
+            self.save()
 
     def remember(self, key: str, value: Any):
-        self.state[key] = value
-        self.save()
+        with self._lock:
+            self.state[key] = value
+            self.save()
 
     def recall(self, key: str, default=None):
         return self.state.get(key, default)
@@ -104,17 +417,37 @@ class EchoMemory:
 # -----------------------------
 # Agents (Genesis Multi-Agent)
 # -----------------------------
-@dataclass
+@dataclass(slots=True)
 class Agent:
     name: str
     system: str
     style: str = "neutral"
     temperature: float = 0.6
 
-    def run(self, llm: LLM, prompt: str, memory_hint: str="") -> str:
+    def run(self, llm: LLM, prompt: str, memory_hint: str="",
+            on_token: Optional[Callable[[str], None]]=None) -> str:
+        return self.ask(llm, task_message(prompt, memory_hint), on_token)
+
+    async def arun(self, llm: LLM, prompt: str, memory_hint: str="") -> str:
+        return await self.aask(llm, task_message(prompt, memory_hint))
+
+    # ask/aask: ส่ง user message ที่ประกอบไว้แล้ว (ใช้ซ้ำข้ามหลาย agent ได้)
+    def ask(self, llm: LLM, user: str,
+            on_token: Optional[Callable[[str], None]]=None) -> str:
         sys = self.system + f"\n\nFollow style: {self.style}"
-        usr = f"{memory_hint}\n\nTASK:\n{prompt}"
-        return llm.chat(system=sys, user=usr, temperature=self.temperature)
+        return llm.chat(system=sys, user=user, temperature=self.temperature,
+                        on_token=on_token)
+
+    async def aask(self, llm: LLM, user: str) -> str:
+        sys = self.system + f"\n\nFollow style: {self.style}"
+        return await llm.achat(system=sys, user=user, temperature=self.temperature)
+
+def task_message(prompt: str, memory_hint: str="") -> str:
+    """
+    User message มาตรฐาน: MEMORY ขึ้นก่อน (prefix เหมือนเดิมทุก call → provider
+    prompt cache ใช้ได้) แล้วค่อยตามด้วย TASK
+    """
+    return f"MEMORY:\n{memory_hint}\n\nTASK:\n{prompt}"
 
 # Agent presets (ปรับได้ตามโดเมน/งานของหุ่น)
 ANALYST = Agent(
@@ -149,31 +482,106 @@ COSMIC = Agent(
     style="philosophical", temperature=0.4
 )
 
+DRAFT_AGENTS = (ANALYST, STRATEGIST, SAFETY, DIALOG)
+
+# -----------------------------
+# Fused Agents (1 call แทน N calls)
+# -----------------------------
+def _parse_json_object(text: str) -> Dict[str, Any]:
+    """JSON object ตัวแรกในข้อความ (ถ้า parse ไม่ได้คืน {})"""
+    start = text.find("{")
+    if start < 0:
+        return {}
+    try:
+        obj, _ = json.JSONDecoder().raw_decode(text, start)
+    except ValueError:
+        return {}
+    return obj if isinstance(obj, dict) else {}
+
+def _fused_messages(agents: List[Agent], prompt: str,
+                    memory_hint: str) -> Tuple[str, str, float]:
+    roles = "\n\n".join(f"[{a.name}] (style: {a.style})\n{a.system}" for a in agents)
+    keys = ", ".join(f'"{a.name}": "..."' for a in agents)
+    system = (f"You will emulate {len(agents)} experts. Answer as each of them independently.\n\n"
+              f"{roles}\n\n"
+              f"Output JSON only, no markdown: {{{keys}}}")
+    return system, task_message(prompt, memory_hint), min(a.temperature for a in agents)
+
+def _fused_sections(agents: List[Agent], text: str) -> Dict[str, Optional[str]]:
+    """section ต่อ agent จากคำตอบ fused (None = ขาด/ว่าง)"""
+    parsed = _parse_json_object(text)
+    out = {}
+    for a in agents:
+        v = parsed.get(a.name)
+        if v is not None and not isinstance(v, str):
+            v = _json_str(v)
+        out[a.name] = v if v and v.strip() else None
+    return out
+
+def fused_agents(llm: LLM, agents: List[Agent], prompt: str,
+                 memory_hint: str) -> Dict[str, str]:
+    """
+    ให้โมเดลเล่นทุก persona ในคำขอเดียว แล้วตอบเป็น JSON แยกตามชื่อ agent
+    section ไหนขาด/ว่าง → เรียก agent นั้นแยกตามปกติ (Safety ต้องมีเสมอ)
+    """
+    system, usr, temp = _fused_messages(agents, prompt, memory_hint)
+    drafts = _fused_sections(agents, llm.chat(system, usr, temperature=temp))
+    return {a.name: drafts[a.name] or a.ask(llm, usr) for a in agents}
+
+async def afused_agents(llm: LLM, agents: List[Agent], prompt: str,
+                        memory_hint: str) -> Dict[str, str]:
+    """Async twin of fused_agents(); missing sections are re-asked concurrently."""
+    system, usr, temp = _fused_messages(agents, prompt, memory_hint)
+    drafts = _fused_sections(agents, await llm.achat(system, usr, temperature=temp))
+    missing = [a for a in agents if drafts[a.name] is None]
+    for a, text in zip(missing, await asyncio.gather(*(a.aask(llm, usr) for a in missing))):
+        drafts[a.name] = text
+    return drafts
+
 # -----------------------------
 # Compound Mind
 # -----------------------------
+_BULLET_RE = re.compile(r"^[\s\-•·*]+")
+
+_COMPOUND_SYSTEM = ("Generate multiple distinct reasoning paths for a humanoid task. "
+                    "Each path must differ in assumption/method/objective. "
+                    "Format as a numbered list.")
+
+def _split_paths(text: str, k_paths: int) -> List[str]:
+    # simple split: lazy, stops after k_paths non-empty lines
+    lines = list(islice((_BULLET_RE.sub("", l).rstrip()
+                         for l in text.splitlines() if l.strip()), k_paths))
+    return lines if lines else [text]
+
 def compound_reasoning(llm: LLM, query: str, k_paths: int=4) -> List[str]:
-    system = ("Generate multiple distinct reasoning paths for a humanoid task. "
-              "Each path must differ in assumption/method/objective. "
-              "Format as a numbered list.")
-    text = llm.chat(system, f"Question:\n{query}\nGenerate {k_paths} perspectives.")
-    # simple split
-    lines = [l.strip("-• ").strip() for l in text.split("\n") if l.strip()]
-    # keep top k
-    return lines[:k_paths] if lines else [text]
+    text = llm.chat(_COMPOUND_SYSTEM, f"Question:\n{query}\nGenerate {k_paths} perspectives.")
+    return _split_paths(text, k_paths)
+
+async def acompound_reasoning(llm: LLM, query: str, k_paths: int=4) -> List[str]:
+    text = await llm.achat(_COMPOUND_SYSTEM, f"Question:\n{query}\nGenerate {k_paths} perspectives.")
+    return _split_paths(text, k_paths)
 
 # -----------------------------
 # Resonance Alignment (merge)
 # -----------------------------
+_RESONANCE_SYSTEM = ("You are the Resonance Aligner. Merge all agent drafts into "
+                     "a single coherent plan suitable for a humanoid robot. "
+                     "Preserve safety and clarity. Output sections: "
+                     "(Objective) (Plan) (Checks) (Fallback).")
+
+def _resonance_user(drafts: Dict[str,str], user_intent: str, memory_hint: str) -> str:
+    merged = "\n\n".join([f"[{k}]\n{v}" for k,v in drafts.items()])
+    return f"MEMORY:\n{memory_hint}\n\nUSER INTENT:\n{user_intent}\n\nDRAFTS:\n{merged}"
+
 def resonance_alignment(llm: LLM, drafts: Dict[str,str],
                         user_intent: str, memory_hint: str) -> str:
-    merged = "\n\n".join([f"[{k}]\n{v}" for k,v in drafts.items()])
-    system = ("You are the Resonance Aligner. Merge all agent drafts into "
-              "a single coherent plan suitable for a humanoid robot. "
-              "Preserve safety and clarity. Output sections: "
-              "(Objective) (Plan) (Checks) (Fallback).")
-    usr = f"USER INTENT:\n{user_intent}\n\nMEMORY:\n{memory_hint}\n\nDRAFTS:\n{merged}"
-    return llm.chat(system, usr, temperature=0.5)
+    return llm.chat(_RESONANCE_SYSTEM, _resonance_user(drafts, user_intent, memory_hint),
+                    temperature=0.5)
+
+async def aresonance_alignment(llm: LLM, drafts: Dict[str,str],
+                               user_intent: str, memory_hint: str) -> str:
+    return await llm.achat(_RESONANCE_SYSTEM, _resonance_user(drafts, user_intent, memory_hint),
+                           temperature=0.5)
 
 # -----------------------------
 # Safety Rules (hard constraints)
@@ -186,12 +594,53 @@ SAFETY_RULES = [
     "Avoid liquid spills on electronics.",
     "Announce intent before moving."
 ]
+# ค่าคงที่ → serialize ครั้งเดียวตอน import; think() ต่อ string เอาเอง
+_SAFETY_RULES_JSON = _json_str(SAFETY_RULES)
+MIN_HUMAN_DIST_M = 0.7
+
+# (keyword, violation) — เพิ่มคำ/วลีได้ตามโดเมน; สแกนทั้งหมดในรอบเดียว
+_HIGH_SPEED = "Potential high speed near humans."
+SAFETY_KEYWORDS = [(kw, _HIGH_SPEED) for kw in (
+    "run", "runs", "running",
+    "sprint", "sprints", "sprinting",
+    "throw", "throws", "thrown", "throwing",
+)]
+_SAFETY_TAGS = dict(SAFETY_KEYWORDS)
+
+# build ครั้งเดียวตอน import: Aho-Corasick ถ้ามี ไม่งั้น regex alternation ที่ compile แล้ว
+_SAFETY_AC = None
+if ahocorasick is not None:
+    _SAFETY_AC = ahocorasick.Automaton()
+    for _kw, _tag in SAFETY_KEYWORDS:
+        _SAFETY_AC.add_word(_kw, (_kw, _tag))
+    _SAFETY_AC.make_automaton()
+_SAFETY_RE = re.compile(
+    r"\b(" + "|".join(re.escape(kw) for kw in sorted(_SAFETY_TAGS, key=len, reverse=True)) + r")\b",
+    re.I)
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+def scan_safety_keywords(text: str) -> List[str]:
+    """คืน violations ที่เจอ (ไม่ซ้ำ, ตามลำดับที่พบ) — จับเฉพาะคำเต็ม"""
+    found: Dict[str, None] = {}
+    if _SAFETY_AC is not None:
+        low = text.lower()
+        for end, (kw, tag) in _SAFETY_AC.iter(low):
+            start = end - len(kw) + 1
+            if start > 0 and _is_word_char(low[start - 1]):
+                continue
+            if end + 1 < len(low) and _is_word_char(low[end + 1]):
+                continue
+            found[tag] = None
+    else:
+        for m in _SAFETY_RE.finditer(text):
+            found[_SAFETY_TAGS[m.group(1).lower()]] = None
+    return list(found)
 
 def safety_gate(draft_plan: str) -> Dict[str, Any]:
     """ตรวจเบื้องต้นแบบกฎแข็ง (rule-based quick scan)"""
-    violations = []
-    if "run" in draft_plan.lower():  # ตัวอย่างง่าย ๆ
-        violations.append("Potential high speed near humans.")
+    violations = scan_safety_keywords(draft_plan)
     return {"ok": len(violations)==0, "violations": violations}
 
 # -----------------------------
@@ -199,12 +648,16 @@ def safety_gate(draft_plan: str) -> Dict[str, Any]:
 # -----------------------------
 class HumanoidGenesisRuntime:
     def __init__(self, llm: LLM, memory: EchoMemory,
-                 ros_enabled: bool=ROS_AVAILABLE):
+                 ros_enabled: bool=ROS_AVAILABLE,
+                 use_fused_agents: bool=False):
         self.llm = llm
         self.memory = memory
         self.ros_enabled = ros_enabled
+        self.use_fused_agents = use_fused_agents  # A/B: 1 fused call vs 4 parallel calls
         self.emergency_stop = False
         if self.ros_enabled:
+            import rclpy
+            from rclpy.node import Node
             rclpy.init()
             self.node = Node("genesis_humanoid")
             # TODO: subscribe sensors/estop topics here
@@ -220,36 +673,65 @@ class HumanoidGenesisRuntime:
         }
         return world
 
+    # --- Preflight (กฎแข็งก่อนเรียก LLM) ---
+    def _preflight(self, user_goal: str, world: Dict[str,Any]) -> Optional[str]:
+        """
+        ถ้ากฎแข็งตัดสินได้อยู่แล้ว ไม่ต้องเสีย LLM call เลย
+        คืนแผนปฏิเสธแบบปลอดภัย (canned) หรือ None ถ้าผ่าน
+        """
+        reasons = []
+        if self.emergency_stop:
+            reasons.append(SAFETY_RULES[0])
+        if world.get("dist_min_human_m", math.inf) < MIN_HUMAN_DIST_M:
+            reasons.append(SAFETY_RULES[1])
+        if world.get("humans_nearby") and not safety_gate(user_goal)["ok"]:
+            reasons.append(SAFETY_RULES[2])
+        if not reasons:
+            return None
+        return ("(Objective)\nHold position; the requested goal is blocked by hard safety rules.\n\n"
+                "(Plan)\n- Stop all motion.\n- Announce the hold to nearby humans.\n\n"
+                "(Checks)\n" + "\n".join(f"- {r}" for r in reasons) + "\n\n"
+                "(Fallback)\nWait for the condition to clear or for explicit human permission.")
+
     # --- Think (Genesis + Compound + Cosmic) ---
-    def think(self, user_goal: str, world: Dict[str,Any]) -> Dict[str, str]:
-        mem_hint = json.dumps({
-            "profile": self.memory.profile(),
-            "world": world,
-            "safety_rules": SAFETY_RULES
-        }, ensure_ascii=False)
+    async def think(self, user_goal: str, world: Dict[str,Any]) -> Dict[str, str]:
+        # ทุก LLM call ในนี้เป็น async (ไม่บล็อก loop ของผู้เรียก) และใช้ async client
+        # ตัวเดียวที่ผูกกับ loop นี้ (run_once สร้าง loop ใหม่ทุกครั้ง)
+        async with self.llm.session():
+            return await self._think(user_goal, world)
 
-        perspectives = compound_reasoning(self.llm, user_goal, k_paths=4)
+    async def _think(self, user_goal: str, world: Dict[str,Any]) -> Dict[str, str]:
+        # == _json_str({"profile":..., "world":..., "safety_rules": SAFETY_RULES})
+        mem_hint = ('{"profile":' + _json_str(self.memory.profile()) +
+                    ',"world":' + _json_str(world) +
+                    ',"safety_rules":' + _SAFETY_RULES_JSON + '}')
+
+        perspectives = await acompound_reasoning(self.llm, user_goal, k_paths=4)
 
         prompt = (f"Goal:\n{user_goal}\n\nPerspectives:\n" +
                   "\n".join(f"- {p}" for p in perspectives))
 
-        drafts = {
-            "Analyst": ANALYST.run(self.llm, prompt, mem_hint),
-            "Strategist": STRATEGIST.run(self.llm, prompt, mem_hint),
-            "Safety": SAFETY.run(self.llm, prompt, mem_hint),
-            "Dialog": DIALOG.run(self.llm, prompt, mem_hint)
-        }
+        if self.use_fused_agents:
+            drafts = await afused_agents(self.llm, DRAFT_AGENTS, prompt, mem_hint)
+        else:
+            # drafts เป็นอิสระต่อกัน → ยิงพร้อมกัน (network-bound)
+            # user message ประกอบครั้งเดียว ใช้ร่วมทั้ง 4 agent
+            task = task_message(prompt, mem_hint)
+            names, coros = zip(*[(a.name, a.aask(self.llm, task))
+                                 for a in DRAFT_AGENTS])
+            results = await asyncio.gather(*coros)
+            drafts = dict(zip(names, results))
 
-        merged = resonance_alignment(self.llm, drafts, user_goal, mem_hint)
+        merged = await aresonance_alignment(self.llm, drafts, user_goal, mem_hint)
 
         # Safety hard gate (ภายใน)
         g = safety_gate(merged)
         if not g["ok"]:
             merged += f"\n\n[SAFETY NOTICE] Violations: {g['violations']}"
 
-        cosmic = COSMIC.run(self.llm,
-                            f"Base plan:\n{merged}\n\nPropose learning updates.",
-                            mem_hint)
+        cosmic = await COSMIC.arun(self.llm,
+                                   f"Base plan:\n{merged}\n\nPropose learning updates.",
+                                   mem_hint)
 
         return {"plan": merged, "cosmic": cosmic}
 
@@ -267,7 +749,11 @@ class HumanoidGenesisRuntime:
             print("[E-STOP] Abort.")
             return
         world = self.perceive()
-        out = self.think(user_goal, world)
+        refusal = self._preflight(user_goal, world)
+        if refusal is not None:
+            print("\n— GENESIS PLAN (preflight) —\n", refusal)
+            return
+        out = asyncio.run(self.think(user_goal, world))
         print("\n— GENESIS PLAN —\n", out["plan"])
         print("\n— COSMIC MIND —\n", out["cosmic"])
         self.act(out["plan"])
@@ -276,7 +762,14 @@ class HumanoidGenesisRuntime:
 # Example
 # -----------------------------
 if __name__ == "__main__":
-    llm = LLM()  # auto-picks provider from env
+    ap = argparse.ArgumentParser(description="Humanoid Genesis runtime demo")
+    ap.add_argument("--fused-agents", action="store_true",
+                    help="Produce the 4 agent drafts with one fused LLM call")
+    ap.add_argument("--semantic-cache", action="store_true",
+                    help="Also reuse answers for near-identical TASK text (same memory/world only)")
+    args = ap.parse_args()
+
+    llm = LLM(cache=SemanticCache(semantic=args.semantic_cache))  # auto-picks provider from env
     mem = EchoMemory()
     # ตั้งโปรไฟล์หุ่นให้เป็น “Money Atlas style”
     if not mem.profile():
@@ -286,7 +779,8 @@ if __name__ == "__main__":
             "domain": ["human_interaction","safe_manipulation","coffee_service"]
         })
 
-    runtime = HumanoidGenesisRuntime(llm, mem, ros_enabled=False)
+    runtime = HumanoidGenesisRuntime(llm, mem, ros_enabled=False,
+                                     use_fused_agents=args.fused_agents)
     goal = "Serve a hot pour-over coffee to a guest at table A, then clean the station."
     runtime.run_once(goal)
             
@@ -1,14 +1,18 @@
 from __future__ import annotations
 
 import argparse
+import functools
 import json
 import os
+import queue
 import re
+import sys
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
-import jsonschema
+import orjson
 
 from providers import get_provider
 from providers.base import ProviderError
@@ -17,11 +21,55 @@ from providers.base import ProviderError
 DEFAULT_SYSTEM_PROMPT = "./PROMPTS/genesis_protocol_system.prompt.md"
 
 
+@functools.lru_cache(maxsize=64)
+def _read_text_cached(path: str, mtime_ns: int) -> str:
+    return Path(path).read_text(encoding="utf-8")
+
+
 def read_text(path: str) -> str:
     p = Path(path)
     if not p.exists():
         raise FileNotFoundError(f"File not found: {path}")
-    return p.read_text(encoding="utf-8")
+    # keyed on mtime as well, so an edited prompt/schema is picked up on the next call
+    return _read_text_cached(path, p.stat().st_mtime_ns)
+
+
+# Structural characters for the brace scanner; everything else is skipped in C.
+_JSON_TOKEN_RE = re.compile(r'[{}"\\]')
+
+
+def _first_json_object(text: str) -> Optional[str]:
+    """
+    Return the first balanced {...} in text, or None.
+    One linear pass that tracks brace depth and string/escape state,
+    so braces inside JSON strings do not count and nothing backtracks.
+    """
+    depth = 0
+    start = -1
+    in_string = False
+    skip_to = -1
+    for m in _JSON_TOKEN_RE.finditer(text):
+        i = m.start()
+        if i < skip_to:
+            continue
+        ch = text[i]
+        if in_string:
+            if ch == "\\":
+                skip_to = i + 2
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            # quotes in surrounding prose are ignored; only track strings inside an object
+            in_string = depth > 0
+        elif ch == "{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == "}" and depth:
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
 
 
 def extract_json(text: str) -> str:
@@ -35,16 +83,82 @@ def extract_json(text: str) -> str:
     if text.startswith("{") and text.endswith("}"):
         return text
 
-    # Try to find JSON object with a balanced-ish regex heuristic
+    obj = _first_json_object(text)
+    if obj is not None:
+        return obj
+
+    # Unbalanced output: fall back to the greedy regex heuristic
     m = re.search(r"\{.*\}", text, flags=re.DOTALL)
     if not m:
         raise ValueError("No JSON object found in model output.")
     return m.group(0)
 
 
+@functools.lru_cache(maxsize=32)
+def _validator_cached(schema_path: str, mtime_ns: int):
+    """Parse + check a schema once per (path, mtime); reuse the compiled validator afterwards."""
+    import jsonschema  # deferred: only needed when validating
+
+    schema = orjson.loads(read_text(schema_path))
+    cls = jsonschema.validators.validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema)
+
+
+def _validator_for(schema_path: str):
+    p = Path(schema_path)
+    if not p.exists():
+        raise FileNotFoundError(f"File not found: {schema_path}")
+    # keyed on mtime like read_text, so an edited schema is picked up on the next call
+    return _validator_cached(schema_path, p.stat().st_mtime_ns)
+
+
 def validate_json_schema(instance: dict, schema_path: str) -> None:
-    schema = json.loads(read_text(schema_path))
-    jsonschema.validate(instance=instance, schema=schema)
+    import jsonschema
+
+    # Same error selection as jsonschema.validate(), minus the per-call schema setup.
+    error = jsonschema.exceptions.best_match(_validator_for(schema_path).iter_errors(instance))
+    if error is not None:
+        raise error
+
+
+def run_provider(name: str, system_prompt: str, user_prompt: str,
+                 schema_path: Optional[str]) -> dict:
+    """One provider end to end: chat -> extract JSON -> parse -> (optional) validate."""
+    resp = get_provider(name).chat(system=system_prompt, user=user_prompt)
+    instance = orjson.loads(extract_json(resp.text))
+    if schema_path:
+        validate_json_schema(instance, schema_path)
+    return instance
+
+
+def race_providers(names: List[str], system_prompt: str, user_prompt: str,
+                   schema_path: Optional[str]) -> Tuple[str, dict]:
+    """
+    Send the same prompt to several providers at once and return the first
+    valid JSON. Calls are network-bound (requests releases the GIL), so
+    threads overlap them and wall-clock is roughly the fastest valid provider.
+    """
+    # Daemon threads, not a pool: losers keep running after we return, and pool
+    # workers would be joined at interpreter exit (CLI waits for the slowest).
+    results: queue.Queue = queue.Queue()  # (name, instance, error)
+
+    def worker(name: str) -> None:
+        try:
+            results.put((name, run_provider(name, system_prompt, user_prompt, schema_path), None))
+        except Exception as e:  # one provider failing must not stop the race
+            results.put((name, None, e))
+
+    for n in names:
+        threading.Thread(target=worker, args=(n,), name=f"race-{n}", daemon=True).start()
+
+    errors: Dict[str, Exception] = {}
+    for _ in names:
+        name, instance, err = results.get()
+        if err is None:
+            return name, instance
+        errors[name] = err
+    raise ProviderError("All providers failed: " + "; ".join(f"{n}: {e}" for n, e in errors.items()))
 
 
 def main():
@@ -67,6 +181,11 @@ def main():
                     help="Skip JSON schema validation")
     ap.add_argument("--dry-run", action="store_true",
                     help="Do not call provider; print combined prompt and exit")
+    ap.add_argument("--stream", action="store_true",
+                    help="Stream model output to stderr as it is generated")
+    ap.add_argument("--providers", default=None,
+                    help="Comma-separated providers to query in parallel; first valid JSON wins "
+                         "(overrides --provider, ignores --stream)")
 
     args = ap.parse_args()
 
@@ -86,27 +205,46 @@ def main():
         print(user_prompt)
         return
 
+    if args.providers:
+        names = [n.strip() for n in args.providers.split(",") if n.strip()]
+        schema_path = None if args.no_validate else args.schema
+        try:
+            winner, instance = race_providers(names, system_prompt, user_prompt, schema_path)
+        except ProviderError as e:
+            raise SystemExit(f"[ProviderError] {e}")
+        Path(args.out).write_bytes(orjson.dumps(instance, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        print(f"OK: wrote {args.out} (provider={winner}, schema={args.schema})")
+        return
+
     try:
         provider = get_provider(args.provider)
-        resp = provider.chat(system=system_prompt, user=user_prompt)
+        if args.stream:
+            resp = provider.stream(system=system_prompt, user=user_prompt)
+            for delta in resp:
+                print(delta, end="", file=sys.stderr, flush=True)
+            print(file=sys.stderr)
+        else:
+            resp = provider.chat(system=system_prompt, user=user_prompt)
+        raw_text = resp.text
     except ProviderError as e:
         raise SystemExit(f"[ProviderError] {e}")
 
-    raw_text = resp.text
     json_text = extract_json(raw_text)
 
     try:
-        instance = json.loads(json_text)
-    except json.JSONDecodeError as e:
+        instance = orjson.loads(json_text)
+    except json.JSONDecodeError as e:  # orjson.JSONDecodeError subclasses it
         raise SystemExit(f"[JSONDecodeError] Could not parse JSON: {e}\n\nRaw:\n{json_text}")
 
     if not args.no_validate:
+        import jsonschema
+
         try:
             validate_json_schema(instance, args.schema)
         except jsonschema.ValidationError as e:
             raise SystemExit(f"[SchemaValidationError] Output does not match schema:\n{e}")
 
-    Path(args.out).write_text(json.dumps(instance, ensure_ascii=False, indent=2), encoding="utf-8")
+    Path(args.out).write_bytes(orjson.dumps(instance, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
     print(f"OK: wrote {args.out} (provider={args.provider}, schema={args.schema})")
 
 
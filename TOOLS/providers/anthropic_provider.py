@@ -1,44 +1,77 @@
 from __future__ import annotations
 import os
-import requests
-from typing import Dict, Any
-from .base import BaseProvider, LLMResponse, ProviderError
+from typing import Dict, Any, Iterator, List, Optional
+from .base import (BaseProvider, LLMResponse, LLMStream, ProviderError, ResponseModel,
+                   make_session, iter_json_lines, parse_response)
+
+
+class AnthropicContentBlock(ResponseModel):
+    type: str = ""
+    text: Optional[str] = None
+
+
+class AnthropicMessage(ResponseModel):
+    # Anthropic: content is list of blocks: [{"type":"text","text":"..."}]
+    content: List[AnthropicContentBlock] = []
 
 
 class AnthropicProvider(BaseProvider):
     name = "anthropic"
+    url = "https://api.anthropic.com/v1/messages"
 
     def __init__(self, model: str | None = None):
         self.api_key = os.getenv("ANTHROPIC_API_KEY", "").strip()
         if not self.api_key:
             raise ProviderError("ANTHROPIC_API_KEY is missing.")
         self.model = model or os.getenv("ANTHROPIC_MODEL", "claude-3-5-sonnet-latest")
-
-    def chat(self, system: str, user: str, **kwargs) -> LLMResponse:
-        url = "https://api.anthropic.com/v1/messages"
-        headers = {
+        self._s = make_session({
             "x-api-key": self.api_key,
             "anthropic-version": "2023-06-01",
             "content-type": "application/json",
-        }
-        payload: Dict[str, Any] = {
+        })
+
+    def _payload(self, system: str, user: str, **kwargs) -> Dict[str, Any]:
+        # The system prompt is the stable prefix across calls: mark it cacheable so
+        # Anthropic can skip re-processing it (ignored below the minimum cache size).
+        system_block: Dict[str, Any] = {"type": "text", "text": system}
+        if kwargs.get("cache_prompt", True):
+            system_block["cache_control"] = {"type": "ephemeral"}
+        return {
             "model": self.model,
             "max_tokens": kwargs.get("max_tokens", 1200),
-            "system": system,
+            "system": [system_block],
             "messages": [{"role": "user", "content": user}],
         }
 
-        r = requests.post(url, headers=headers, json=payload, timeout=60)
+    def chat(self, system: str, user: str, **kwargs) -> LLMResponse:
+        payload = self._payload(system, user, **kwargs)
+
+        r = self._s.post(self.url, json=payload, timeout=60)
         if r.status_code >= 400:
             raise ProviderError(f"Anthropic error {r.status_code}: {r.text}")
 
-        data = r.json()
-        text = ""
-        # Anthropic: content is list of blocks: [{"type":"text","text":"..."}]
-        content = data.get("content", [])
-        if isinstance(content, list) and content:
-            text = content[0].get("text", "") or ""
+        msg = parse_response(AnthropicMessage, r, "Anthropic")
+        text = (msg.content[0].text or "") if msg.content else ""
 
         if not text:
             raise ProviderError("Anthropic response contained no text.")
-        return LLMResponse(text=text, raw=data)
+        return LLMResponse(text=text, raw=msg.model_dump())
+
+    def stream(self, system: str, user: str, **kwargs) -> LLMStream:
+        payload = self._payload(system, user, **kwargs)
+        payload["stream"] = True
+
+        r = self._s.post(self.url, json=payload, timeout=60, stream=True)
+        if r.status_code >= 400:
+            raise ProviderError(f"Anthropic error {r.status_code}: {r.text}")
+
+        def deltas() -> Iterator[str]:
+            # SSE events: content_block_delta carries {"delta": {"type": "text_delta", "text": "..."}}
+            for ev in iter_json_lines(r):
+                kind = ev.get("type")
+                if kind == "content_block_delta":
+                    yield ev.get("delta", {}).get("text", "") or ""
+                elif kind == "error":
+                    raise ProviderError(f"Anthropic stream error: {ev.get('error')}")
+
+        return LLMStream(deltas())
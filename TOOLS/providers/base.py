@@ -1,6 +1,10 @@
 from __future__ import annotations
+import json
 from dataclasses import dataclass
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, List, Optional
+import requests
+from pydantic import BaseModel, ConfigDict, ValidationError
+from requests.adapters import HTTPAdapter
 
 
 @dataclass
@@ -9,15 +13,93 @@ class LLMResponse:
     raw: Optional[Dict[str, Any]] = None
 
 
+class LLMStream:
+    """
+    Incremental response: iterate to receive text deltas as they arrive,
+    or read .text to consume the rest and get the joined result.
+    """
+
+    def __init__(self, chunks: Iterator[str], raw: Optional[Dict[str, Any]] = None):
+        self._chunks = chunks
+        self._parts: List[str] = []
+        self.raw = raw
+
+    def __iter__(self) -> Iterator[str]:
+        for part in self._chunks:
+            if part:
+                self._parts.append(part)
+                yield part
+
+    @property
+    def text(self) -> str:
+        for _ in self:
+            pass
+        return "".join(self._parts)
+
+
 class ProviderError(RuntimeError):
     pass
 
 
+class ResponseModel(BaseModel):
+    """
+    Base for typed provider payloads: parsed straight from the response bytes,
+    unknown fields kept so model_dump() still returns the full raw payload.
+    """
+    model_config = ConfigDict(extra="allow")
+
+
+def parse_response(model: type, r: requests.Response, provider: str):
+    try:
+        return model.model_validate_json(r.content)
+    except ValidationError as e:
+        raise ProviderError(f"{provider} returned an unexpected payload: {e}") from e
+
+
 class BaseProvider:
     """
     Provider interface: implement .chat(system, user) -> LLMResponse
+    Optionally override .stream(system, user) -> LLMStream
     """
     name: str = "base"
 
     def chat(self, system: str, user: str, **kwargs) -> LLMResponse:
         raise NotImplementedError
+
+    def stream(self, system: str, user: str, **kwargs) -> LLMStream:
+        # Fallback for providers without a streaming endpoint: one big chunk.
+        resp = self.chat(system=system, user=user, **kwargs)
+        return LLMStream(iter([resp.text]), raw=resp.raw)
+
+
+def make_session(headers: Optional[Dict[str, str]] = None) -> requests.Session:
+    """
+    Keep-alive session shared by all chats of a provider instance,
+    so only the first call pays the TCP+TLS handshake.
+    """
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    if headers:
+        s.headers.update(headers)
+    return s
+
+
+def iter_json_lines(r: requests.Response, sse: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    Decode a streamed body line by line.
+    sse=True reads server-sent events (`data: {...}`), sse=False reads NDJSON.
+    """
+    with r:
+        for line in r.iter_lines():
+            if not line:
+                continue
+            line = line.decode("utf-8")
+            if sse:
+                if not line.startswith("data:"):
+                    continue
+                line = line[5:].strip()
+                if line == "[DONE]":
+                    break
+            yield json.loads(line)
@@ -1,8 +1,31 @@
 from __future__ import annotations
 import os
-import requests
-from typing import Dict, Any
-from .base import BaseProvider, LLMResponse, ProviderError
+from typing import Dict, Any, Iterator, List, Optional
+from pydantic import Field
+from .base import (BaseProvider, LLMResponse, LLMStream, ProviderError, ResponseModel,
+                   make_session, iter_json_lines, parse_response)
+
+
+class GeminiPart(ResponseModel):
+    text: Optional[str] = None
+
+
+class GeminiContent(ResponseModel):
+    parts: List[GeminiPart] = []
+
+
+class GeminiCandidate(ResponseModel):
+    content: GeminiContent = Field(default_factory=GeminiContent)
+
+
+class GeminiResponse(ResponseModel):
+    # Gemini: candidates[0].content.parts[0].text
+    candidates: List[GeminiCandidate] = []
+
+    def first_text(self) -> str:
+        if self.candidates and self.candidates[0].content.parts:
+            return self.candidates[0].content.parts[0].text or ""
+        return ""
 
 
 class GeminiProvider(BaseProvider):
@@ -13,6 +36,14 @@ class GeminiProvider(BaseProvider):
         if not self.api_key:
             raise ProviderError("GEMINI_API_KEY is missing.")
         self.model = model or os.getenv("GEMINI_MODEL", "gemini-1.5-pro")
+        self._s = make_session({"content-type": "application/json"})
+
+    def _payload(self, system: str, user: str) -> Dict[str, Any]:
+        return {
+            "contents": [
+                {"role": "user", "parts": [{"text": f"SYSTEM:\n{system}\n\nUSER:\n{user}"}]}
+            ]
+        }
 
     def chat(self, system: str, user: str, **kwargs) -> LLMResponse:
         # Google Generative Language API (Gemini)
@@ -20,28 +51,33 @@ class GeminiProvider(BaseProvider):
         # https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key=API_KEY
         url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:generateContent"
         params = {"key": self.api_key}
-        headers = {"content-type": "application/json"}
-
-        payload: Dict[str, Any] = {
-            "contents": [
-                {"role": "user", "parts": [{"text": f"SYSTEM:\n{system}\n\nUSER:\n{user}"}]}
-            ]
-        }
+        payload = self._payload(system, user)
 
-        r = requests.post(url, params=params, headers=headers, json=payload, timeout=60)
+        r = self._s.post(url, params=params, json=payload, timeout=60)
         if r.status_code >= 400:
             raise ProviderError(f"Gemini error {r.status_code}: {r.text}")
 
-        data = r.json()
-        text = ""
-        # Gemini: candidates[0].content.parts[0].text
-        cands = data.get("candidates", [])
-        if isinstance(cands, list) and cands:
-            content = cands[0].get("content", {})
-            parts = content.get("parts", [])
-            if isinstance(parts, list) and parts:
-                text = parts[0].get("text", "") or ""
+        resp = parse_response(GeminiResponse, r, "Gemini")
+        text = resp.first_text()
 
         if not text:
             raise ProviderError("Gemini response contained no text.")
-        return LLMResponse(text=text, raw=data)
+        return LLMResponse(text=text, raw=resp.model_dump())
+
+    def stream(self, system: str, user: str, **kwargs) -> LLMStream:
+        # Same request body; alt=sse makes the endpoint emit one chunk per `data:` line.
+        url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:streamGenerateContent"
+        params = {"key": self.api_key, "alt": "sse"}
+        payload = self._payload(system, user)
+
+        r = self._s.post(url, params=params, json=payload, timeout=60, stream=True)
+        if r.status_code >= 400:
+            raise ProviderError(f"Gemini error {r.status_code}: {r.text}")
+
+        def deltas() -> Iterator[str]:
+            for chunk in iter_json_lines(r):
+                if "error" in chunk:
+                    raise ProviderError(f"Gemini stream error: {chunk['error']}")
+                yield GeminiResponse.model_validate(chunk).first_text()
+
+        return LLMStream(deltas())
@@ -1,8 +1,17 @@
 from __future__ import annotations
 import os
-import requests
-from typing import Dict, Any
-from .base import BaseProvider, LLMResponse, ProviderError
+from typing import Dict, Any, Iterator, Optional
+from pydantic import Field
+from .base import (BaseProvider, LLMResponse, LLMStream, ProviderError, ResponseModel,
+                   make_session, iter_json_lines, parse_response)
+
+
+class OllamaMessage(ResponseModel):
+    content: Optional[str] = None
+
+
+class OllamaChatResponse(ResponseModel):
+    message: OllamaMessage = Field(default_factory=OllamaMessage)
 
 
 class OllamaProvider(BaseProvider):
@@ -11,25 +20,46 @@ class OllamaProvider(BaseProvider):
     def __init__(self, model: str | None = None, base_url: str | None = None):
         self.base_url = base_url or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
         self.model = model or os.getenv("OLLAMA_MODEL", "llama3.1")
+        self._s = make_session()
 
-    def chat(self, system: str, user: str, **kwargs) -> LLMResponse:
-        url = f"{self.base_url.rstrip('/')}/api/chat"
-        payload: Dict[str, Any] = {
+    def _payload(self, system: str, user: str, stream: bool) -> Dict[str, Any]:
+        return {
             "model": self.model,
             "messages": [
                 {"role": "system", "content": system},
                 {"role": "user", "content": user},
             ],
-            "stream": False,
+            "stream": stream,
         }
 
-        r = requests.post(url, json=payload, timeout=60)
+    def chat(self, system: str, user: str, **kwargs) -> LLMResponse:
+        url = f"{self.base_url.rstrip('/')}/api/chat"
+        payload = self._payload(system, user, stream=False)
+
+        r = self._s.post(url, json=payload, timeout=60)
         if r.status_code >= 400:
             raise ProviderError(f"Ollama error {r.status_code}: {r.text}")
 
-        data = r.json()
-        msg = data.get("message", {})
-        text = msg.get("content", "") if isinstance(msg, dict) else ""
+        resp = parse_response(OllamaChatResponse, r, "Ollama")
+        text = resp.message.content or ""
         if not text:
             raise ProviderError("Ollama response contained no text.")
-        return LLMResponse(text=text, raw=data)
+        return LLMResponse(text=text, raw=resp.model_dump())
+
+    def stream(self, system: str, user: str, **kwargs) -> LLMStream:
+        url = f"{self.base_url.rstrip('/')}/api/chat"
+        payload = self._payload(system, user, stream=True)
+
+        r = self._s.post(url, json=payload, timeout=60, stream=True)
+        if r.status_code >= 400:
+            raise ProviderError(f"Ollama error {r.status_code}: {r.text}")
+
+        def deltas() -> Iterator[str]:
+            # NDJSON: one {"message": {"content": "..."}, "done": false} per line
+            for chunk in iter_json_lines(r, sse=False):
+                if "error" in chunk:
+                    raise ProviderError(f"Ollama stream error: {chunk['error']}")
+                msg = chunk.get("message", {})
+                yield msg.get("content", "") if isinstance(msg, dict) else ""
+
+        return LLMStream(deltas())
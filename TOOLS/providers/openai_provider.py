@@ -1,52 +1,90 @@
 from __future__ import annotations
+import hashlib
 import os
-import requests
-from typing import Dict, Any
-from .base import BaseProvider, LLMResponse, ProviderError
+from typing import Dict, Any, Iterator, List, Optional
+from .base import (BaseProvider, LLMResponse, LLMStream, ProviderError, ResponseModel,
+                   make_session, iter_json_lines, parse_response)
+
+
+class OpenAIContentPart(ResponseModel):
+    type: str = ""
+    text: Optional[str] = None
+
+
+class OpenAIOutputItem(ResponseModel):
+    type: str = ""
+    content: List[OpenAIContentPart] = []
+
+
+class OpenAIResponse(ResponseModel):
+    # Newer Responses API: output[0].content[0].text
+    output: List[OpenAIOutputItem] = []
+    text: Any = None
 
 
 class OpenAIProvider(BaseProvider):
     name = "openai"
+    url = "https://api.openai.com/v1/responses"
 
     def __init__(self, model: str | None = None):
         self.api_key = os.getenv("OPENAI_API_KEY", "").strip()
         if not self.api_key:
             raise ProviderError("OPENAI_API_KEY is missing.")
         self.model = model or os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
-
-    def chat(self, system: str, user: str, **kwargs) -> LLMResponse:
-        # OpenAI Responses API (simple, provider-agnostic-ish)
-        url = "https://api.openai.com/v1/responses"
-        headers = {
+        self._s = make_session({
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
-        }
-        payload: Dict[str, Any] = {
+        })
+
+    def _payload(self, system: str, user: str, **kwargs) -> Dict[str, Any]:
+        # OpenAI Responses API (simple, provider-agnostic-ish)
+        # prompt_cache_key routes calls sharing a system prompt to the same prefix cache.
+        cache_key = kwargs.get("prompt_cache_key") or hashlib.blake2b(
+            system.encode("utf-8"), digest_size=8).hexdigest()
+        return {
             "model": self.model,
             "input": [
                 {"role": "system", "content": system},
                 {"role": "user", "content": user},
             ],
+            "prompt_cache_key": cache_key,
         }
 
-        r = requests.post(url, headers=headers, json=payload, timeout=60)
+    def chat(self, system: str, user: str, **kwargs) -> LLMResponse:
+        payload = self._payload(system, user, **kwargs)
+
+        r = self._s.post(self.url, json=payload, timeout=60)
         if r.status_code >= 400:
             raise ProviderError(f"OpenAI error {r.status_code}: {r.text}")
 
-        data = r.json()
+        resp = parse_response(OpenAIResponse, r, "OpenAI")
 
-        # Try to extract text robustly:
         text = ""
-        if isinstance(data, dict):
-            # Newer Responses API: output[0].content[0].text
-            out = data.get("output", [])
-            if out and isinstance(out, list):
-                content = out[0].get("content", [])
-                if content and isinstance(content, list):
-                    text = content[0].get("text", "") or ""
-            # Fallback:
-            text = text or data.get("text", "") or ""
+        if resp.output and resp.output[0].content:
+            text = resp.output[0].content[0].text or ""
+        # Fallback (only when the top-level field is plain text):
+        if not text and isinstance(resp.text, str):
+            text = resp.text
 
         if not text:
             raise ProviderError("OpenAI response contained no text.")
-        return LLMResponse(text=text, raw=data)
+        return LLMResponse(text=text, raw=resp.model_dump())
+
+    def stream(self, system: str, user: str, **kwargs) -> LLMStream:
+        payload = self._payload(system, user, **kwargs)
+        payload["stream"] = True
+
+        r = self._s.post(self.url, json=payload, timeout=60, stream=True)
+        if r.status_code >= 400:
+            raise ProviderError(f"OpenAI error {r.status_code}: {r.text}")
+
+        def deltas() -> Iterator[str]:
+            # SSE events: response.output_text.delta carries {"delta": "..."}
+            for ev in iter_json_lines(r):
+                kind = ev.get("type")
+                if kind == "response.output_text.delta":
+                    yield ev.get("delta", "") or ""
+                elif kind in ("error", "response.failed"):
+                    raise ProviderError(f"OpenAI stream error: {ev}")
+
+        return LLMStream(deltas())
@@ -8,26 +8,42 @@
 #   - Provide confidence + evidence
 #   - Designed for future extraction as Genesis Protocol extension
 #
-# Dependencies: standard library only
-# (Optional) If you want speed: replace some routines with numpy/pandas later.
+# Dependencies: numpy
+# (Optional) numba: JIT-compiles the rolling-window kernels; without it the
+#            same kernels fall back to vectorized numpy.
 # ------------------------------------------------------------
 
 from __future__ import annotations
 
-from dataclasses import dataclass, field, asdict
-from typing import Any, Dict, List, Optional, Tuple, Protocol, Callable, Union
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Protocol, Callable, Union
 import csv
 import math
-import statistics
-from datetime import datetime
+from bisect import bisect_right
+import operator
+from datetime import datetime, timezone
+import functools
 import asyncio
 
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):  # no-op stand-in so kernels still define
+        if args and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
 
 # ============================================================
 # 0) Core Data Models (Genesis-friendly)
 # ============================================================
 
-@dataclass
+@dataclass(slots=True)
 class Candle:
     ts: int  # unix seconds
     o: float
@@ -36,7 +52,68 @@ class Candle:
     c: float
     v: float
 
-@dataclass
+@dataclass(slots=True)
+class CandleColumns:
+    """Columnar (SoA) twin of List[Candle]: one contiguous array per field."""
+    ts: np.ndarray  # int64 unix seconds
+    o: np.ndarray   # float64
+    h: np.ndarray
+    l: np.ndarray
+    c: np.ndarray
+    v: np.ndarray
+    # lazily filled by typical_price() / bar_range() / vwap_prefix(); shared by every consumer
+    _tp: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
+    _rng: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
+    _cum_pv: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
+    _cum_v: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
+
+    def __len__(self) -> int:
+        return int(self.ts.shape[0])
+
+    def vwap_prefix(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Running sums of typical_price*volume and volume (computed once)."""
+        if self._cum_pv is None:
+            self._cum_pv = np.cumsum(self.typical_price() * self.v)
+            self._cum_v = np.cumsum(self.v)
+        return self._cum_pv, self._cum_v
+
+    def __getitem__(self, idx: slice) -> "CandleColumns":
+        # slices are numpy views, no copy (a computed typical price comes along)
+        return CandleColumns(self.ts[idx], self.o[idx], self.h[idx], self.l[idx], self.c[idx], self.v[idx],
+                             _tp=self._tp[idx] if self._tp is not None else None,
+                             _rng=self._rng[idx] if self._rng is not None else None)
+
+    def typical_price(self) -> np.ndarray:
+        """(h+l+c)/3 (computed once)."""
+        if self._tp is None:
+            self._tp = (self.h + self.l + self.c) / 3.0
+        return self._tp
+
+    def bar_range(self) -> np.ndarray:
+        """h-l (computed once)."""
+        if self._rng is None:
+            self._rng = self.h - self.l
+        return self._rng
+
+    @classmethod
+    def from_candles(cls, candles: List[Candle]) -> "CandleColumns":
+        ts = np.fromiter((cd.ts for cd in candles), dtype=np.int64, count=len(candles))
+        rows = np.array([(cd.o, cd.h, cd.l, cd.c, cd.v) for cd in candles], dtype=np.float64).reshape(-1, 5)
+        o, h, l, c, v = np.ascontiguousarray(rows.T)
+        return cls(ts=ts, o=o, h=h, l=l, c=c, v=v)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Plain {"ts","o","h","l","c","v"} rows (what asdict(Candle) gives), built from the columns."""
+        return [{"ts": t, "o": o, "h": h, "l": l, "c": c, "v": v}
+                for t, o, h, l, c, v in zip(self.ts.tolist(), self.o.tolist(), self.h.tolist(),
+                                            self.l.tolist(), self.c.tolist(), self.v.tolist())]
+
+    def to_candles(self) -> List[Candle]:
+        return [Candle(ts=t, o=o, h=h, l=l, c=c, v=v)
+                for t, o, h, l, c, v in zip(self.ts.tolist(), self.o.tolist(), self.h.tolist(),
+                                            self.l.tolist(), self.c.tolist(), self.v.tolist())]
+
+@dataclass(slots=True)
 class LayerBand:
     layer: int                     # 1..5
     price_low: float
@@ -48,7 +125,7 @@ class LayerBand:
     confidence: float              # 0..1
     evidence: List[str] = field(default_factory=list)
 
-@dataclass
+@dataclass(slots=True)
 class SMCLayerMap:
     symbol: str
     timeframe: str
@@ -58,21 +135,37 @@ class SMCLayerMap:
     notes: List[str] = field(default_factory=list)
     meta: Dict[str, Any] = field(default_factory=dict)
 
-@dataclass
+@dataclass(slots=True)
 class GenesisContext:
     # Genesis Protocol mapping: Will -> Belief -> Behavior -> Structure -> Outcome
     symbol: str
     timeframe: str
-    candles: List[Candle]
+    candles: Optional[List[Candle]]  # None when built from columns; see candle_list()
     params: Dict[str, Any] = field(default_factory=dict)
     traces: Dict[str, Any] = field(default_factory=dict)  # debug/inspection
+    arrays: Optional[CandleColumns] = None  # SoA view of candles, built once; built-in agents read only this
+    # first/last 200 candles as dicts for external agent tasks; built on first use
+    candles_head: Optional[List[Dict[str, Any]]] = field(default=None, repr=False)
+    candles_tail: Optional[List[Dict[str, Any]]] = field(default=None, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.arrays is None:
+            if self.candles is None:
+                raise ValueError("GenesisContext needs candles or arrays.")
+            self.arrays = CandleColumns.from_candles(self.candles)
+
+    def candle_list(self) -> List[Candle]:
+        """Row view for agents that want Candle objects; materialized on first call only."""
+        if self.candles is None:
+            self.candles = self.arrays.to_candles()
+        return self.candles
 
 
 # ============================================================
 # 1) External Agent / LLM Interface (pluggable)
 # ============================================================
 
-@dataclass
+@dataclass(slots=True)
 class AgentTask:
     """A neutral task envelope for internal/external agents."""
     name: str
@@ -80,7 +173,7 @@ class AgentTask:
     input: Dict[str, Any]
     schema_hint: Dict[str, Any] = field(default_factory=dict)  # optional JSON-schema-like hint
 
-@dataclass
+@dataclass(slots=True)
 class AgentResult:
     name: str
     output: Dict[str, Any]
@@ -102,19 +195,22 @@ class ExternalAgentAdapter(Protocol):
 class AgentRegistry:
     """Register optional external adapters by task name prefix or exact match."""
     def __init__(self) -> None:
-        self._routes: List[Tuple[str, ExternalAgentAdapter]] = []
+        self._routes: Dict[str, ExternalAgentAdapter] = {}
+        self._max_prefix_len = -1
 
     def register(self, task_name_prefix: str, adapter: ExternalAgentAdapter) -> None:
-        self._routes.append((task_name_prefix, adapter))
+        # first registration of a prefix wins (same as the original linear scan)
+        self._routes.setdefault(task_name_prefix, adapter)
+        self._max_prefix_len = max(self._max_prefix_len, len(task_name_prefix))
 
     def resolve(self, task_name: str) -> Optional[ExternalAgentAdapter]:
-        # longest prefix match
-        best: Optional[Tuple[str, ExternalAgentAdapter]] = None
-        for prefix, ad in self._routes:
-            if task_name.startswith(prefix):
-                if best is None or len(prefix) > len(best[0]):
-                    best = (prefix, ad)
-        return best[1] if best else None
+        # longest prefix match: probe task_name's own prefixes, longest first.
+        # O(len(task_name)) hash lookups, independent of how many routes exist.
+        for k in range(min(len(task_name), self._max_prefix_len), -1, -1):
+            ad = self._routes.get(task_name[:k])
+            if ad is not None:
+                return ad
+        return None
 
 
 # ============================================================
@@ -130,12 +226,17 @@ def load_ohlcv_csv(path: str,
                   v: str = "volume",
                   ts_is_ms: bool = False) -> List[Candle]:
     candles: List[Candle] = []
+    in_order = True
+    prev_ts = None
     with open(path, "r", newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
             ts_val = int(float(row[ts_col]))
             if ts_is_ms:
                 ts_val //= 1000
+            if prev_ts is not None and ts_val < prev_ts:
+                in_order = False
+            prev_ts = ts_val
             candles.append(Candle(
                 ts=ts_val,
                 o=float(row[o]),
@@ -144,56 +245,173 @@ def load_ohlcv_csv(path: str,
                 c=float(row[c]),
                 v=float(row[v]),
             ))
-    candles.sort(key=lambda x: x.ts)
+    # exports are usually already chronological; only sort when they are not
+    if not in_order:
+        candles.sort(key=operator.attrgetter("ts"))
     return candles
 
+def load_ohlcv_columns(path: str,
+                       ts_col: str = "ts",
+                       o: str = "open",
+                       h: str = "high",
+                       l: str = "low",
+                       c: str = "close",
+                       v: str = "volume",
+                       ts_is_ms: bool = False) -> CandleColumns:
+    """Same CSV contract as load_ohlcv_csv, but straight into columns (no Candle objects)."""
+    fields = (ts_col, o, h, l, c, v)
+    cols: List[List[str]] = [[] for _ in fields]
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            for dst, name in zip(cols, fields):
+                dst.append(row[name])
+    ts = np.asarray(cols[0], dtype=np.float64).astype(np.int64)
+    if ts_is_ms:
+        ts //= 1000
+    arrs = [np.asarray(col, dtype=np.float64) for col in cols[1:]]
+    if np.all(np.diff(ts) >= 0):
+        return CandleColumns(ts, *arrs)
+    order = np.argsort(ts, kind="stable")
+    return CandleColumns(ts[order], *(a[order] for a in arrs))
+
 
 # ============================================================
-# 3) Core Quant Building Blocks (no numpy)
+# 3) Core Quant Building Blocks
 # ============================================================
+# Kernels work on float64 arrays with NaN for warm-up slots. With numba they
+# are compiled loops; otherwise the *_np twins do the same with numpy ops.
 
-def sma(values: List[float], window: int) -> List[Optional[float]]:
-    if window <= 0:
-        raise ValueError("window must be > 0")
-    out: List[Optional[float]] = [None] * len(values)
+@njit(cache=True)  # no fastmath: it may reorder the running sum
+def _sma_nb(values: np.ndarray, window: int) -> np.ndarray:
+    n = values.shape[0]
+    out = np.full(n, np.nan)
     s = 0.0
-    q: List[float] = []
-    for i, x in enumerate(values):
-        q.append(x)
-        s += x
-        if len(q) > window:
-            s -= q.pop(0)
-        if len(q) == window:
+    for i in range(n):
+        s += values[i]
+        if i >= window:
+            s -= values[i - window]
+        if i + 1 >= window:
             out[i] = s / window
     return out
 
-def atr(candles: List[Candle], window: int = 14) -> List[Optional[float]]:
-    tr: List[float] = []
-    prev_c = candles[0].c if candles else 0.0
-    for cd in candles:
-        tr_val = max(cd.h - cd.l, abs(cd.h - prev_c), abs(cd.l - prev_c))
-        tr.append(tr_val)
-        prev_c = cd.c
-    return sma(tr, window)
-
-def rolling_std(values: List[float], window: int) -> List[Optional[float]]:
-    out: List[Optional[float]] = [None] * len(values)
-    for i in range(len(values)):
+def _sma_np(values: np.ndarray, window: int) -> np.ndarray:
+    out = np.full(values.shape[0], np.nan)
+    if values.shape[0] >= window:
+        # sum each window directly (column by column) rather than differencing a
+        # global cumsum, which loses precision as the prefix grows
+        win = np.lib.stride_tricks.sliding_window_view(values, window)
+        s = np.zeros(win.shape[0])
+        for j in range(window):
+            s += win[:, j]
+        out[window - 1:] = s / window
+    return out
+
+def _true_range_np(h: np.ndarray, l: np.ndarray, c: np.ndarray) -> np.ndarray:
+    prev_c = np.concatenate((c[:1], c[:-1]))
+    return np.maximum(h - l, np.maximum(np.abs(h - prev_c), np.abs(l - prev_c)))
+
+@njit(cache=True)
+def _atr_nb(h: np.ndarray, l: np.ndarray, c: np.ndarray, window: int) -> np.ndarray:
+    # true range + its SMA in one pass, no intermediate TR array.
+    # Running sum adds the new TR before dropping the oldest, exactly like
+    # _sma_nb, so atr() == sma(true_range) bit for bit (no fastmath reordering).
+    n = h.shape[0]
+    out = np.full(n, np.nan)
+    trs = np.empty(window)  # ring buffer of the last `window` TRs
+    prev_c = c[0] if n else 0.0
+    s = 0.0
+    for i in range(n):
+        tr = max(h[i] - l[i], abs(h[i] - prev_c), abs(l[i] - prev_c))
+        prev_c = c[i]
+        slot = i % window
+        s += tr
+        if i >= window:
+            s -= trs[slot]
+        trs[slot] = tr
         if i + 1 >= window:
-            segment = values[i + 1 - window:i + 1]
-            out[i] = statistics.pstdev(segment)
+            out[i] = s / window
+    return out
+
+def _atr_np(h: np.ndarray, l: np.ndarray, c: np.ndarray, window: int) -> np.ndarray:
+    return _sma_np(_true_range_np(h, l, c), window)
+
+# Rolling std is a pure function of each window's contents (two-pass over the
+# window, same summation order in both twins): equal windows - common with
+# tick-quantized prices - give bit-identical std, so `<= percentile` tests
+# are stable. A sliding update would drift with the window's history.
+@njit(cache=True)
+def _rolling_std_nb(values: np.ndarray, window: int) -> np.ndarray:
+    n = values.shape[0]
+    out = np.full(n, np.nan)
+    for i in range(window - 1, n):
+        s = 0.0
+        for j in range(i + 1 - window, i + 1):
+            s += values[j]
+        mean = s / window
+        ss = 0.0
+        c = 0.0
+        for j in range(i + 1 - window, i + 1):
+            d = values[j] - mean
+            ss += d * d
+            c += d
+        # c is the rounding residue of the mean (corrected two-pass)
+        out[i] = math.sqrt(max((ss - c * c / window) / window, 0.0))
+    return out
+
+def _rolling_std_np(values: np.ndarray, window: int) -> np.ndarray:
+    out = np.full(values.shape[0], np.nan)
+    if values.shape[0] >= window:
+        win = np.lib.stride_tricks.sliding_window_view(values, window)
+        # column-by-column accumulation = the same left-to-right order as the JIT loop
+        s = np.zeros(win.shape[0])
+        for j in range(window):
+            s += win[:, j]
+        mean = s / window
+        ss = np.zeros_like(s)
+        c = np.zeros_like(s)
+        for j in range(window):
+            d = win[:, j] - mean
+            ss += d * d
+            c += d
+        out[window - 1:] = np.sqrt(np.maximum((ss - c * c / window) / window, 0.0))
     return out
 
+if NUMBA_AVAILABLE:
+    _sma_kernel, _atr_kernel, _rolling_std_kernel = _sma_nb, _atr_nb, _rolling_std_nb
+else:
+    _sma_kernel, _atr_kernel, _rolling_std_kernel = _sma_np, _atr_np, _rolling_std_np
+
+# Rolling helpers return float64 arrays with NaN in the warm-up slots
+# (mask with np.isnan, reduce with np.nan* functions).
+def sma(values: Union[List[float], np.ndarray], window: int) -> np.ndarray:
+    if window <= 0:
+        raise ValueError("window must be > 0")
+    return _sma_kernel(np.asarray(values, dtype=np.float64), window)
+
+def atr(candles: Union[List[Candle], CandleColumns], window: int = 14) -> np.ndarray:
+    if window <= 0:
+        raise ValueError("window must be > 0")
+    cols = candles if isinstance(candles, CandleColumns) else CandleColumns.from_candles(candles)
+    return _atr_kernel(cols.h, cols.l, cols.c, window)
+
+def rolling_std(values: Union[List[float], np.ndarray], window: int) -> np.ndarray:
+    if window <= 0:
+        raise ValueError("window must be > 0")
+    return _rolling_std_kernel(np.asarray(values, dtype=np.float64), window)
+
 def percentile(values: List[float], p: float) -> float:
-    if not values:
+    if len(values) == 0:
         return float("nan")
-    xs = sorted(values)
+    xs = np.asarray(values, dtype=np.float64)
     k = (len(xs) - 1) * p
     f = math.floor(k)
     c = math.ceil(k)
+    # only the two order statistics around k are needed: O(n) select, not a full sort
+    part = np.partition(xs, (f, c))
     if f == c:
-        return xs[int(k)]
-    return xs[f] + (xs[c] - xs[f]) * (k - f)
+        return float(part[f])
+    return float(part[f] + (part[c] - part[f]) * (k - f))
 
 def clamp(x: float, lo: float, hi: float) -> float:
     return max(lo, min(hi, x))
@@ -203,70 +421,79 @@ def clamp(x: float, lo: float, hi: float) -> float:
 # 4) Feature Extraction: Pivot, Structure, Volume-at-Price proxy, AVWAP
 # ============================================================
 
-def find_swings(candles: List[Candle], left: int = 3, right: int = 3) -> Dict[str, List[int]]:
+def find_swings(candles: Union[List[Candle], CandleColumns],
+                left: int = 3, right: int = 3) -> Dict[str, List[int]]:
     """
     Simple swing high/low detection.
     Returns indices of swing highs and lows.
     """
-    highs: List[int] = []
-    lows: List[int] = []
-    n = len(candles)
-    for i in range(left, n - right):
-        hi = candles[i].h
-        lo = candles[i].l
-        is_hi = all(hi >= candles[j].h for j in range(i - left, i + right + 1))
-        is_lo = all(lo <= candles[j].l for j in range(i - left, i + right + 1))
-        if is_hi:
-            highs.append(i)
-        if is_lo:
-            lows.append(i)
-    return {"highs": highs, "lows": lows}
-
-def anchored_vwap(candles: List[Candle], anchor_idx: int, price_field: str = "c") -> List[Optional[float]]:
+    cols = candles if isinstance(candles, CandleColumns) else CandleColumns.from_candles(candles)
+    n = len(cols)
+    w = left + right + 1
+    if n < w:
+        return {"highs": [], "lows": []}
+    # a bar is a swing high when it equals the max of its [i-left, i+right] window
+    is_hi = cols.h[left:n - right] == np.lib.stride_tricks.sliding_window_view(cols.h, w).max(axis=1)
+    is_lo = cols.l[left:n - right] == np.lib.stride_tricks.sliding_window_view(cols.l, w).min(axis=1)
+    return {"highs": (np.flatnonzero(is_hi) + left).tolist(),
+            "lows": (np.flatnonzero(is_lo) + left).tolist()}
+
+def anchored_vwap(candles: Union[List[Candle], CandleColumns], anchor_idx: int,
+                  price_field: str = "c") -> np.ndarray:
     """
     AVWAP from anchor to end. Uses typical price (h+l+c)/3 weighted by volume.
+    NaN before the anchor and wherever no volume has traded yet.
     """
-    out: List[Optional[float]] = [None] * len(candles)
-    cum_pv = 0.0
-    cum_v = 0.0
-    for i in range(anchor_idx, len(candles)):
-        cd = candles[i]
-        tp = (cd.h + cd.l + cd.c) / 3.0
-        cum_pv += tp * cd.v
-        cum_v += cd.v
-        out[i] = (cum_pv / cum_v) if cum_v > 0 else None
+    cols = candles if isinstance(candles, CandleColumns) else CandleColumns.from_candles(candles)
+    cpv, cv = cols.vwap_prefix()
+    cum_pv = cpv[anchor_idx:]
+    cum_v = cv[anchor_idx:]
+    if anchor_idx > 0:
+        # sums from the anchor = prefix sums minus everything before it
+        cum_pv = cum_pv - cpv[anchor_idx - 1]
+        cum_v = cum_v - cv[anchor_idx - 1]
+    out = np.full(len(cols), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[anchor_idx:] = np.where(cum_v > 0, cum_pv / cum_v, np.nan)
     return out
 
-def volume_nodes_proxy(candles: List[Candle], bins: int = 60) -> List[Tuple[float, float, float]]:
+def volume_nodes_proxy(candles: Union[List[Candle], CandleColumns], bins: int = 60) -> List[Tuple[float, float, float]]:
     """
     Approx volume-at-price using candle typical price; distribute full volume into a bin.
     Returns list of (bin_low, bin_high, vol).
     """
-    if not candles:
+    cols = candles if isinstance(candles, CandleColumns) else CandleColumns.from_candles(candles)
+    if len(cols) == 0:
         return []
-    prices = [(cd.h + cd.l + cd.c) / 3.0 for cd in candles]
-    lo = min(prices)
-    hi = max(prices)
+    prices = cols.typical_price()
+    lo = float(prices.min())
+    hi = float(prices.max())
     if hi <= lo:
-        return [(lo, hi, sum(cd.v for cd in candles))]
+        return [(lo, hi, float(cols.v.sum()))]
 
     bin_size = (hi - lo) / bins
-    vols = [0.0] * bins
-    for cd in candles:
-        tp = (cd.h + cd.l + cd.c) / 3.0
-        idx = int((tp - lo) / bin_size)
-        idx = max(0, min(bins - 1, idx))
-        vols[idx] += cd.v
-
-    nodes: List[Tuple[float, float, float]] = []
-    for i, v in enumerate(vols):
-        b0 = lo + i * bin_size
-        b1 = lo + (i + 1) * bin_size
-        nodes.append((b0, b1, v))
-    return nodes
+    idx = np.clip(((prices - lo) / bin_size).astype(np.intp), 0, bins - 1)
+    vols = np.bincount(idx, weights=cols.v, minlength=bins)
+
+    edges = (lo + np.arange(bins + 1) * bin_size).tolist()
+    return list(zip(edges[:-1], edges[1:], vols.tolist()))
 
 def top_hvn(nodes: List[Tuple[float, float, float]], k: int = 5) -> List[Tuple[float, float, float]]:
-    return sorted(nodes, key=lambda x: x[2], reverse=True)[:k]
+    n = len(nodes)
+    if k <= 0 or n == 0:
+        return []
+    vols = np.fromiter((nd[2] for nd in nodes), dtype=np.float64, count=n)
+    if k < n:
+        # O(n) select of the k-th largest volume; ties at that level go to the
+        # lowest bins, exactly like a stable descending sort would pick them
+        kth = vols[np.argpartition(vols, n - k)[n - k]]
+        above = np.flatnonzero(vols > kth)
+        at = np.flatnonzero(vols == kth)[:k - above.size]
+        idx = np.concatenate((above, at))
+    else:
+        idx = np.arange(n)
+    idx = idx[np.lexsort((idx, -vols[idx]))]
+    return [nodes[i] for i in idx.tolist()]
 
 
 # ============================================================
@@ -283,42 +510,41 @@ class StructureAgent(BaseAgent):
     name = "internal.structure"
 
     async def run(self, ctx: GenesisContext) -> AgentResult:
-        swings = find_swings(ctx.candles,
+        swings = find_swings(ctx.arrays,
                              left=int(ctx.params.get("swing_left", 3)),
                              right=int(ctx.params.get("swing_right", 3)))
         # Determine a macro "base" and "impulse" boundary:
         # Heuristic: base ends at first major BOS = close breaks above last swing high after a swing low.
-        closes = [c.c for c in ctx.candles]
+        closes = ctx.arrays.c
         swing_highs = swings["highs"]
         swing_lows = swings["lows"]
 
         base_end = None
         if swing_lows and swing_highs:
+            # best close from j onwards: a high that is never broken is rejected in O(1)
+            best_after = np.maximum.accumulate(closes[::-1])[::-1]
             # pick earliest significant swing low and then break above nearest swing high
             for li in swing_lows:
-                # find a swing high after li
-                hi_candidates = [hi for hi in swing_highs if hi > li]
-                if not hi_candidates:
+                # find the first swing high after li (swing_highs is ascending)
+                idx = bisect_right(swing_highs, li)
+                if idx == len(swing_highs):
                     continue
-                hi0 = hi_candidates[0]
-                level = ctx.candles[hi0].h
+                hi0 = swing_highs[idx]
+                level = ctx.arrays.h[hi0]
                 # bos: close above that level later
-                for j in range(hi0 + 1, len(closes)):
-                    if closes[j] > level:
-                        base_end = j
-                        break
-                if base_end is not None:
+                if hi0 + 1 < len(closes) and best_after[hi0 + 1] > level:
+                    base_end = hi0 + 1 + int(np.flatnonzero(closes[hi0 + 1:] > level)[0])
                     break
 
         if base_end is None:
-            base_end = max(0, int(len(ctx.candles) * 0.35))
+            base_end = max(0, int(len(ctx.arrays) * 0.35))
 
         out = {
             "swings": swings,
             "base_end_idx": base_end,
             "base_start_idx": 0,
             "impulse_start_idx": base_end,
-            "impulse_end_idx": len(ctx.candles) - 1
+            "impulse_end_idx": len(ctx.arrays) - 1
         }
         evidence = [
             f"swings highs={len(swings['highs'])}, lows={len(swings['lows'])}",
@@ -330,7 +556,7 @@ class VolumeAgent(BaseAgent):
     name = "internal.volume"
 
     async def run(self, ctx: GenesisContext) -> AgentResult:
-        nodes = volume_nodes_proxy(ctx.candles, bins=int(ctx.params.get("vap_bins", 60)))
+        nodes = volume_nodes_proxy(ctx.arrays, bins=int(ctx.params.get("vap_bins", 60)))
         hvn = top_hvn(nodes, k=int(ctx.params.get("hvn_topk", 6)))
         out = {"vap_nodes": nodes, "hvn": hvn}
         evidence = [f"vap bins={len(nodes)}", f"hvn_top={[(round(a,4),round(b,4),round(v,2)) for a,b,v in hvn[:3]]}"]
@@ -340,10 +566,9 @@ class CostBasisAgent(BaseAgent):
     name = "internal.cost_basis"
 
     async def run(self, ctx: GenesisContext) -> AgentResult:
-        swings = ctx.traces.get("structure", {}).get("swings")  # may exist
-        if not swings:
-            swings = find_swings(ctx.candles, 3, 3)
-        swing_lows = swings["lows"]
+        # structure runs in an earlier batch (see SMCLayerEngine.AGENT_DEPS); an external
+        # structure adapter may omit swings, which falls through to the default anchors
+        swing_lows = ctx.traces["structure"].get("swings", {}).get("lows", [])
         # choose a few anchors (earliest base low, mid-cycle low, late-cycle low)
         anchors = []
         if swing_lows:
@@ -352,11 +577,11 @@ class CostBasisAgent(BaseAgent):
             anchors.append(swing_lows[-1])
             anchors = sorted(set(anchors))
         else:
-            anchors = [0, len(ctx.candles)//2]
+            anchors = [0, len(ctx.arrays)//2]
 
         avwaps = {}
         for a in anchors:
-            av = anchored_vwap(ctx.candles, a)
+            av = anchored_vwap(ctx.arrays, a)
             avwaps[str(a)] = av
 
         out = {"anchors": anchors, "avwaps": avwaps}
@@ -367,21 +592,16 @@ class RegimeAgent(BaseAgent):
     name = "internal.regime"
 
     async def run(self, ctx: GenesisContext) -> AgentResult:
-        closes = [c.c for c in ctx.candles]
+        closes = ctx.arrays.c
         rstd = rolling_std(closes, window=int(ctx.params.get("vol_window", 20)))
-        atrv = atr(ctx.candles, window=int(ctx.params.get("atr_window", 14)))
+        atrv = atr(ctx.arrays, window=int(ctx.params.get("atr_window", 14)))
         # regime proxy: compression when std and atr both below 30th percentile
-        std_vals = [x for x in rstd if x is not None]
-        atr_vals = [x for x in atrv if x is not None]
-        std_p30 = percentile(std_vals, 0.30) if std_vals else 0.0
-        atr_p30 = percentile(atr_vals, 0.30) if atr_vals else 0.0
-
-        compression = []
-        for i in range(len(closes)):
-            if rstd[i] is None or atrv[i] is None:
-                compression.append(False)
-            else:
-                compression.append((rstd[i] <= std_p30) and (atrv[i] <= atr_p30))
+        # nanpercentile skips the NaN warm-up itself and selects by partition, not a full sort
+        std_p30 = float(np.nanpercentile(rstd, 30)) if not np.isnan(rstd).all() else 0.0
+        atr_p30 = float(np.nanpercentile(atrv, 30)) if not np.isnan(atrv).all() else 0.0
+
+        # NaN warm-up slots compare False, so they never count as compression
+        compression = (rstd <= std_p30) & (atrv <= atr_p30)
 
         out = {"compression_mask": compression, "std_p30": std_p30, "atr_p30": atr_p30}
         evidence = [f"std_p30={std_p30:.6f}", f"atr_p30={atr_p30:.6f}"]
@@ -394,24 +614,22 @@ class AccumDistAgent(BaseAgent):
         # Simple absorption proxy:
         # - Up move with rising volume but narrowing range -> possible distribution
         # - Down move with rising volume but failure to break prior low -> absorption
-        candles = ctx.candles
-        ranges = [cd.h - cd.l for cd in candles]
-        vols = [cd.v for cd in candles]
-        r_sma = sma(ranges, window=int(ctx.params.get("range_window", 14)))
-        v_sma = sma(vols, window=int(ctx.params.get("vol_sma_window", 14)))
-
-        dist_flags = [False] * len(candles)
-        abs_flags = [False] * len(candles)
-
-        for i in range(len(candles)):
-            if r_sma[i] is None or v_sma[i] is None:
-                continue
-            # distribution: close up vs prev close, vol above avg, range below avg
-            if i > 0 and candles[i].c > candles[i-1].c and vols[i] > v_sma[i] and ranges[i] < r_sma[i]:
-                dist_flags[i] = True
-            # absorption: close down, vol above avg, range below avg
-            if i > 0 and candles[i].c < candles[i-1].c and vols[i] > v_sma[i] and ranges[i] < r_sma[i]:
-                abs_flags[i] = True
+        cols = ctx.arrays
+        n = len(cols)
+        rng = cols.bar_range()
+        r_sma = sma(rng, window=int(ctx.params.get("range_window", 14)))
+        v_sma = sma(cols.v, window=int(ctx.params.get("vol_sma_window", 14)))
+
+        up = np.zeros(n, dtype=bool)
+        down = np.zeros(n, dtype=bool)
+        up[1:] = cols.c[1:] > cols.c[:-1]
+        down[1:] = cols.c[1:] < cols.c[:-1]
+        # vol above avg, range below avg (NaN warm-up compares False)
+        hot = (cols.v > v_sma) & (rng < r_sma)
+
+        # distribution: close up vs prev close; absorption: close down
+        dist_flags = up & hot
+        abs_flags = down & hot
 
         out = {"distribution_flags": dist_flags, "absorption_flags": abs_flags}
         evidence = ["dist: up close + high vol + narrow range", "abs: down close + high vol + narrow range"]
@@ -451,46 +669,46 @@ class VerifierAgent(BaseAgent):
 # 6) Layer Resolver (the heart): Build Layer bands + entry windows
 # ============================================================
 
-def _segment_by_indices(candles: List[Candle], i0: int, i1: int) -> List[Candle]:
+def _segment_by_indices(candles: Union[List[Candle], CandleColumns], i0: int, i1: int) -> Union[List[Candle], CandleColumns]:
     i0 = max(0, i0)
     i1 = min(len(candles)-1, i1)
     if i1 < i0:
-        return []
+        return candles[0:0]
     return candles[i0:i1+1]
 
-def _weighted_centroid_price(candles: List[Candle]) -> Optional[float]:
-    if not candles:
+def _weighted_centroid_price(cols: CandleColumns) -> Optional[float]:
+    if len(cols) == 0:
         return None
-    num = 0.0
-    den = 0.0
-    for cd in candles:
-        tp = (cd.h + cd.l + cd.c) / 3.0
-        num += tp * cd.v
-        den += cd.v
-    return (num / den) if den > 0 else None
-
-def _find_longest_true_window(mask: List[bool], start_idx: int, end_idx: int) -> Tuple[Optional[int], Optional[int], int]:
-    best = (None, None, 0)
-    cur_s = None
-    cur_len = 0
-    for i in range(start_idx, end_idx + 1):
-        if mask[i]:
-            if cur_s is None:
-                cur_s = i
-                cur_len = 1
-            else:
-                cur_len += 1
-        else:
-            if cur_s is not None and cur_len > best[2]:
-                best = (cur_s, i - 1, cur_len)
-            cur_s = None
-            cur_len = 0
-    if cur_s is not None and cur_len > best[2]:
-        best = (cur_s, end_idx, cur_len)
-    return best
+    den = float(cols.v.sum())
+    return (float(np.dot(cols.typical_price(), cols.v)) / den) if den > 0 else None
+
+def _true_runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start and (inclusive) end index of every run of True in mask."""
+    # run-length encode: +1 where a True run opens, -1 one past where it closes
+    m = np.asarray(mask, dtype=bool).view(np.int8)
+    d = np.diff(np.concatenate(([0], m, [0])))
+    return np.flatnonzero(d == 1), np.flatnonzero(d == -1) - 1
+
+def _find_longest_true_window(mask: np.ndarray, start_idx: int, end_idx: int,
+                              runs: Optional[Tuple[np.ndarray, np.ndarray]] = None
+                              ) -> Tuple[Optional[int], Optional[int], int]:
+    # pass runs=_true_runs(mask) to encode once and answer many zones from it
+    if end_idx < start_idx:
+        return (None, None, 0)
+    starts, ends = runs if runs is not None else _true_runs(mask)
+    # runs are sorted and disjoint: the ones touching the zone are a contiguous block
+    lo = int(np.searchsorted(ends, start_idx))
+    hi = int(np.searchsorted(starts, end_idx, side="right"))
+    if hi <= lo:
+        return (None, None, 0)
+    s = np.maximum(starts[lo:hi], start_idx)
+    lens = np.minimum(ends[lo:hi], end_idx) - s + 1
+    k = int(np.argmax(lens))  # first of the longest runs, as before
+    ln = int(lens[k])
+    return (int(s[k]), int(s[k]) + ln - 1, ln)
 
 def resolve_layers(ctx: GenesisContext) -> List[LayerBand]:
-    candles = ctx.candles
+    ts = ctx.arrays.ts
     structure = ctx.traces["structure"]
     volume = ctx.traces["volume"]
     costb = ctx.traces["cost_basis"]
@@ -498,7 +716,7 @@ def resolve_layers(ctx: GenesisContext) -> List[LayerBand]:
     accd = ctx.traces["accum_dist"]
 
     base_end = int(structure["base_end_idx"])
-    n = len(candles)
+    n = len(ctx.arrays)
 
     # Define rough cycle zones (can be improved later):
     base_zone = (0, base_end)
@@ -508,15 +726,17 @@ def resolve_layers(ctx: GenesisContext) -> List[LayerBand]:
     peak_zone = (int(n * 0.85), n - 1)
 
     # HVN candidates: map to a "price band"
-    hvn = volume.get("hvn", [])
-    hvn_sorted = sorted(hvn, key=lambda x: x[2], reverse=True)
+    hvn = np.asarray(volume.get("hvn", []), dtype=np.float64).reshape(-1, 3)
+    # top_hvn output is already ranked; the stable argsort only matters for external adapters
+    hvn = hvn[np.argsort(-hvn[:, 2], kind="stable")]
+    hvn_b0, hvn_b1, hvn_vol = hvn[:, 0], hvn[:, 1], hvn[:, 2]
 
     def band_from_zone(z: Tuple[int,int], widen: float = 0.0) -> Tuple[float,float,Optional[float],List[str]]:
-        seg = _segment_by_indices(candles, z[0], z[1])
-        if not seg:
+        seg = _segment_by_indices(ctx.arrays, z[0], z[1])
+        if len(seg) == 0:
             return (float("nan"), float("nan"), None, ["empty zone"])
-        lo = min(cd.l for cd in seg)
-        hi = max(cd.h for cd in seg)
+        lo = float(seg.l.min())
+        hi = float(seg.h.max())
         if widen > 0:
             span = (hi - lo)
             lo -= span * widen
@@ -524,19 +744,20 @@ def resolve_layers(ctx: GenesisContext) -> List[LayerBand]:
         cb = _weighted_centroid_price(seg)
         return (lo, hi, cb, [f"zone={z[0]}..{z[1]}", f"centroid={cb:.6f}" if cb else "centroid=None"])
 
-    compression = regime["compression_mask"]
+    compression = np.asarray(regime["compression_mask"], dtype=bool)
+    compression_runs = _true_runs(compression)  # shared by all five zones
 
     # Entry windows: longest compression window inside each zone
     def entry_window(z: Tuple[int,int]) -> Tuple[Optional[int], Optional[int], float, List[str]]:
-        s, e, ln = _find_longest_true_window(compression, z[0], z[1])
+        s, e, ln = _find_longest_true_window(compression, z[0], z[1], compression_runs)
         if s is None:
             # fallback: last 20% of zone
             ss = z[0] + int((z[1]-z[0]) * 0.6)
             ee = z[1]
-            return (candles[ss].ts, candles[ee].ts, 0.35, [f"fallback window idx={ss}..{ee}"])
+            return (int(ts[ss]), int(ts[ee]), 0.35, [f"fallback window idx={ss}..{ee}"])
         # confidence scaled by window length
         conf = clamp(ln / max(10, (z[1]-z[0]+1)), 0.35, 0.85)
-        return (candles[s].ts, candles[e].ts, conf, [f"compression window idx={s}..{e} len={ln}"])
+        return (int(ts[s]), int(ts[e]), conf, [f"compression window idx={s}..{e} len={ln}"])
 
     # Layer 1: base zone + strongest HVN in base
     l1_lo, l1_hi, l1_cb, l1_ev = band_from_zone(base_zone, widen=0.05)
@@ -559,12 +780,16 @@ def resolve_layers(ctx: GenesisContext) -> List[LayerBand]:
     l5_s, l5_e, l5_wconf, l5_wev = entry_window(peak_zone)
 
     # State inference (simple heuristic):
-    dist_flags = accd["distribution_flags"]
-    abs_flags = accd["absorption_flags"]
+    # prefix counts (leading 0), so each zone's flag count is one subtraction
+    dist_cs = np.concatenate(([0], np.cumsum(np.asarray(accd["distribution_flags"], dtype=np.int32))))
+    abs_cs = np.concatenate(([0], np.cumsum(np.asarray(accd["absorption_flags"], dtype=np.int32))))
 
     def state_for_zone(z: Tuple[int,int]) -> Tuple[str,float,List[str]]:
-        d = sum(1 for i in range(z[0], z[1]+1) if dist_flags[i])
-        a = sum(1 for i in range(z[0], z[1]+1) if abs_flags[i])
+        if z[1] < z[0]:
+            d = a = 0
+        else:
+            d = int(dist_cs[z[1]+1] - dist_cs[z[0]])
+            a = int(abs_cs[z[1]+1] - abs_cs[z[0]])
         total = max(1, z[1]-z[0]+1)
         d_rate = d / total
         a_rate = a / total
@@ -637,23 +862,48 @@ def resolve_layers(ctx: GenesisContext) -> List[LayerBand]:
 
     # Optional: refine with HVN hints (snap cost_basis toward nearest HVN band centroid)
     # (kept minimal in v1; deeper logic can be private signature later)
-    if hvn_sorted:
+    if hvn.shape[0]:
         for lb in layers:
-            # find HVN that overlaps layer price band
-            overlaps = [n for n in hvn_sorted if not (n[1] < lb.price_low or n[0] > lb.price_high)]
-            if overlaps:
-                b0, b1, vol = overlaps[0]
-                hvn_centroid = (b0 + b1) / 2.0
+            # first-ranked HVN overlapping the band ("not disjoint", so a NaN band still matches)
+            overlaps = np.flatnonzero(~((hvn_b1 < lb.price_low) | (hvn_b0 > lb.price_high)))
+            if overlaps.size:
+                j = overlaps[0]
+                hvn_centroid = float(hvn_b0[j] + hvn_b1[j]) / 2.0
                 if lb.cost_basis is not None:
                     lb.cost_basis = (lb.cost_basis * 0.7) + (hvn_centroid * 0.3)
-                lb.evidence.append(f"hvn_hint centroid={hvn_centroid:.6f} vol={vol:.2f}")
+                lb.evidence.append(f"hvn_hint centroid={hvn_centroid:.6f} vol={float(hvn_vol[j]):.2f}")
 
     return layers
   # ============================================================
 # 7) Orchestrator (Multi-Agent + External hooks)
 # ============================================================
 
+def _json_ready(obj: Any) -> Any:
+    """Traces hold ndarrays (NaN warm-up); external agents get plain lists with None for NaN."""
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == "f":
+            return [None if x != x else x for x in obj.tolist()]
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        v = obj.item()
+        return None if v != v else v
+    if isinstance(obj, dict):
+        return {k: _json_ready(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_json_ready(v) for v in obj)
+    return obj
+
 class SMCLayerEngine:
+    # trace key -> trace keys it reads. Agents whose deps are met run together.
+    AGENT_DEPS: Dict[str, Tuple[str, ...]] = {
+        "structure": (),
+        "volume": (),
+        "regime": (),
+        "accum_dist": (),
+        "cost_basis": ("structure",),
+        "verifier": ("structure", "volume", "cost_basis"),
+    }
+
     def __init__(self, registry: Optional[AgentRegistry] = None) -> None:
         self.registry = registry or AgentRegistry()
 
@@ -667,12 +917,39 @@ class SMCLayerEngine:
             VerifierAgent(),
         ]
 
+    def _batches(self) -> List[List[BaseAgent]]:
+        """Group internal agents by dependency depth; each batch sorted by name."""
+        keys = [a.name.split(".")[-1] for a in self.internal_agents]
+        deps = {}
+        for i, key in enumerate(keys):
+            # unknown agents keep the old sequential contract: after everything listed before them
+            deps[key] = self.AGENT_DEPS.get(key, tuple(keys[:i]))
+        depth: Dict[str, int] = {}
+
+        def depth_of(key: str) -> int:
+            if key not in depth:
+                depth[key] = 1 + max((depth_of(d) for d in deps[key] if d in deps), default=-1)
+            return depth[key]
+
+        batches: List[List[BaseAgent]] = []
+        for agent, key in zip(self.internal_agents, keys):
+            d = depth_of(key)
+            while len(batches) <= d:
+                batches.append([])
+            batches[d].append(agent)
+        return [sorted(b, key=lambda a: a.name) for b in batches]
+
     async def _run_agent(self, agent: BaseAgent, ctx: GenesisContext) -> AgentResult:
         # If an external adapter is registered for this agent's name, use it
         adapter = self.registry.resolve(agent.name)
         if adapter is None:
             return await agent.run(ctx)
 
+        if ctx.candles_head is None:
+            # once per analysis, shared by every external agent
+            ctx.candles_head = ctx.arrays[:200].to_dicts()
+            ctx.candles_tail = ctx.arrays[-200:].to_dicts()
+
         # External task schema: keep stable for LLM tool calling
         task = AgentTask(
             name=agent.name,
@@ -685,9 +962,9 @@ class SMCLayerEngine:
                 "symbol": ctx.symbol,
                 "timeframe": ctx.timeframe,
                 "params": ctx.params,
-                "candles_head": [asdict(c) for c in ctx.candles[:200]],
-                "candles_tail": [asdict(c) for c in ctx.candles[-200:]],
-                "traces_so_far": ctx.traces,  # may be large; in real LLM use summarize
+                "candles_head": ctx.candles_head,
+                "candles_tail": ctx.candles_tail,
+                "traces_so_far": _json_ready(ctx.traces),  # may be large; in real LLM use summarize
             },
             schema_hint={
                 "type": "object",
@@ -702,35 +979,44 @@ class SMCLayerEngine:
         )
         return await adapter.run_task(task)
 
-    async def analyze(self, symbol: str, timeframe: str, candles: List[Candle],
+    @staticmethod
+    def _store_trace(ctx: GenesisContext, agent: BaseAgent, res: AgentResult) -> None:
+        key = agent.name.split(".")[-1]
+        ctx.traces[key] = res.output
+        # also keep confidence in trace for verifier
+        ctx.traces[key]["_confidence"] = res.confidence
+        ctx.traces[key]["_evidence"] = res.evidence
+        if res.warnings:
+            ctx.traces[key]["_warnings"] = res.warnings
+
+    async def analyze(self, symbol: str, timeframe: str,
+                      candles: Union[List[Candle], CandleColumns],
                       params: Optional[Dict[str, Any]] = None) -> SMCLayerMap:
-        if not candles or len(candles) < 100:
+        if candles is None or len(candles) < 100:
             raise ValueError("Need at least ~100 candles for meaningful layer inference.")
 
+        # Accept either layout; agents read ctx.arrays (SoA). Columns input never
+        # builds Candle rows unless an agent asks via ctx.candle_list().
+        cols = candles if isinstance(candles, CandleColumns) else None
+
         ctx = GenesisContext(
             symbol=symbol,
             timeframe=timeframe,
-            candles=candles,
+            candles=None if cols is not None else candles,
             params=params or {},
-            traces={}
+            traces={},
+            arrays=cols
         )
+        # derived columns computed in one place up front; zone slices share them
+        ctx.arrays.typical_price()  # AVWAP, volume nodes, zone centroids
+        ctx.arrays.bar_range()      # acc/dist range filter
 
-        # Run agents sequentially (determinism). You can parallelize later.
-        for agent in self.internal_agents:
-            res = await self._run_agent(agent, ctx)
-            # store trace
-            key = agent.name.split(".")[-1]
-            ctx.traces[key] = res.output
-            # also keep confidence in trace for verifier
-            ctx.traces[key]["_confidence"] = res.confidence
-            ctx.traces[key]["_evidence"] = res.evidence
-            if res.warnings:
-                ctx.traces[key]["_warnings"] = res.warnings
-
-            # allow later agents to read early outputs conveniently
-            if key == "structure":
-                # share swings directly for cost-basis agent
-                ctx.traces["structure"] = res.output
+        # Independent agents run concurrently (pays off with external adapters);
+        # traces are stored batch by batch in name order, so results stay deterministic.
+        for batch in self._batches():
+            results = await asyncio.gather(*(self._run_agent(agent, ctx) for agent in batch))
+            for agent, res in zip(batch, results):
+                self._store_trace(ctx, agent, res)
 
         # Post: layer resolution
         layers = resolve_layers(ctx)
@@ -738,8 +1024,8 @@ class SMCLayerEngine:
         sm = SMCLayerMap(
             symbol=symbol,
             timeframe=timeframe,
-            start_ts=candles[0].ts,
-            end_ts=candles[-1].ts,
+            start_ts=int(ctx.arrays.ts[0]),
+            end_ts=int(ctx.arrays.ts[-1]),
             layers=layers,
             notes=[
                 "This is a cost-basis proxy inference, not true holder cost basis.",
@@ -754,31 +1040,36 @@ class SMCLayerEngine:
 # 8) Helper: Pretty print & timestamp formatting
 # ============================================================
 
+@functools.lru_cache(maxsize=4096)
 def ts_to_str(ts: Optional[int]) -> str:
     if ts is None:
         return "n/a"
-    return datetime.utcfromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S UTC")
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
 
-def format_layer_map(lm: SMCLayerMap) -> str:
-    lines = []
-    lines.append(f"SMC Layer Map | {lm.symbol} | {lm.timeframe}")
-    lines.append(f"Range: {ts_to_str(lm.start_ts)} -> {ts_to_str(lm.end_ts)}")
-    lines.append("-" * 72)
+def _fmt_price(x: Optional[float]) -> str:
+    return f"{x:.4f}" if x is not None and x == x else "n/a"  # None/NaN -> n/a
+
+def _layer_map_lines(lm: SMCLayerMap) -> Iterator[str]:
+    yield f"SMC Layer Map | {lm.symbol} | {lm.timeframe}"
+    yield f"Range: {ts_to_str(lm.start_ts)} -> {ts_to_str(lm.end_ts)}"
+    yield "-" * 72
     for lb in lm.layers:
-        lines.append(
-            f"Layer {lb.layer}: {lb.price_low:.4f} - {lb.price_high:.4f} | "
+        yield (
+            f"Layer {lb.layer}: {_fmt_price(lb.price_low)} - {_fmt_price(lb.price_high)} | "
             f"Entry: {ts_to_str(lb.entry_start_ts)} -> {ts_to_str(lb.entry_end_ts)} | "
-            f"CostBasis~ {lb.cost_basis:.4f if lb.cost_basis is not None else float('nan')} | "
+            f"CostBasis~ {_fmt_price(lb.cost_basis)} | "
             f"State: {lb.state} | Conf: {lb.confidence:.2f}"
         )
         # show top evidence lines
         for ev in lb.evidence[:4]:
-            lines.append(f"  - {ev}")
+            yield f"  - {ev}"
     if lm.notes:
-        lines.append("-" * 72)
+        yield "-" * 72
         for n in lm.notes:
-            lines.append(f"Note: {n}")
-    return "\n".join(lines)
+            yield f"Note: {n}"
+
+def format_layer_map(lm: SMCLayerMap) -> str:
+    return "\n".join(_layer_map_lines(lm))
 
 
 # ============================================================
@@ -787,7 +1078,7 @@ def format_layer_map(lm: SMCLayerMap) -> str:
 
 async def _demo():
     # Example:
-    # candles = load_ohlcv_csv("XAGUSD_4H.csv", ts_col="ts", ts_is_ms=False)
+    # candles = load_ohlcv_columns("XAGUSD_4H.csv", ts_col="ts", ts_is_ms=False)
     # engine = SMCLayerEngine()
     # lm = await engine.analyze(symbol="XAGUSD", timeframe="4H", candles=candles, params={"vap_bins": 80})
     # print(format_layer_map(lm))